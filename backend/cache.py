@@ -0,0 +1,318 @@
+import asyncio
+import functools
+import logging
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, NamedTuple, Optional
+
+import orjson
+
+from http_caching import body_etag
+from metrics import record_cache_lookup
+from serialization import dumps
+
+
+logger = logging.getLogger(__name__)
+
+
+_MISSING = object()
+
+
+class LRUCache:
+    """In-process LRU cache with a per-entry time to live."""
+
+    def __init__(self, maxsize: int = 1024, ttl: Optional[float] = None, name: Optional[str] = None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.name = name
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def _record(self, hit: bool):
+        if hit:
+            self.hits += 1
+        else:
+            self.misses += 1
+        if self.name:
+            record_cache_lookup(self.name, hit)
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        entry = self._entries.get(key, _MISSING)
+        if entry is _MISSING:
+            self._record(False)
+            return default
+        value, expires_at = entry
+        if expires_at is not None and expires_at <= time.monotonic():
+            del self._entries[key]
+            self._record(False)
+            return default
+        self._entries.move_to_end(key)
+        self._record(True)
+        return value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None):
+        ttl = self.ttl if ttl is None else ttl
+        expires_at = time.monotonic() + ttl if ttl else None
+        self._entries[key] = (value, expires_at)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, key: Hashable):
+        self._entries.pop(key, None)
+
+    def clear(self):
+        self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class CachedPayload(NamedTuple):
+    version: int
+    payload: Any
+    body: bytes
+    etag: str
+    built_at: float
+
+
+class PayloadCache:
+    """Caches a single computed payload alongside its serialized bytes.
+
+    Every invalidate() bumps the version, so a build that raced with a write is
+    served to its caller but never stored.
+    """
+
+    def __init__(self, serializer: Callable[[Any], bytes], ttl: Optional[float] = None,
+                 name: Optional[str] = None):
+        self.serializer = serializer
+        self.ttl = ttl
+        self.name = name
+        self._version = 0
+        self._entry: Optional[CachedPayload] = None
+        self._lock: Optional[asyncio.Lock] = None
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def version(self) -> int:
+        return self._version
+
+    def _fresh_entry(self) -> Optional[CachedPayload]:
+        entry = self._entry
+        if entry is None or entry.version != self._version:
+            return None
+        if self.ttl and entry.built_at + self.ttl <= time.monotonic():
+            return None
+        return entry
+
+    async def get_or_build(self, builder: Callable[[], Awaitable[Any]]) -> CachedPayload:
+        entry = self._fresh_entry()
+        if entry is not None:
+            self._record(True)
+            return entry
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            # Another request may have rebuilt the payload while we waited
+            entry = self._fresh_entry()
+            if entry is not None:
+                self._record(True)
+                return entry
+            self._record(False)
+            version = self._version
+            payload = await builder()
+            body = self.serializer(payload)
+            entry = CachedPayload(version, payload, body, body_etag(body), time.monotonic())
+            if version == self._version:
+                self._entry = entry
+            return entry
+
+    def _record(self, hit: bool):
+        if hit:
+            self.hits += 1
+        else:
+            self.misses += 1
+        if self.name:
+            record_cache_lookup(self.name, hit)
+
+    def invalidate(self):
+        self._version += 1
+        self._entry = None
+
+
+@functools.lru_cache(maxsize=None)
+def redis_from_url(url: Optional[str]):
+    """An asyncio redis client, or None when no URL is configured.
+
+    One client per URL, so the cache tier and the rate limiter share a connection pool.
+    """
+    if not url:
+        return None
+    # Imported here so redis is only needed when a redis URL is configured
+    import redis.asyncio as redis
+
+    return redis.Redis.from_url(url)
+
+
+class InvalidationBus:
+    """Fans cache invalidations out to every worker over redis pub/sub.
+
+    Each cache registers a callback that drops its local copy; without redis,
+    invalidations only reach the current process.
+    """
+
+    channel = "cache-invalidation"
+
+    def __init__(self, redis=None):
+        self.redis = redis
+        self.origin = uuid.uuid4().hex
+        self._callbacks: Dict[str, Callable[[Optional[str]], None]] = {}
+
+    def register(self, name: str, callback: Callable[[Optional[str]], None]):
+        self._callbacks[name] = callback
+
+    def _apply(self, name: str, key: Optional[str]):
+        callback = self._callbacks.get(name)
+        if callback is not None:
+            callback(key)
+
+    async def invalidate(self, name: str, key: Optional[str] = None):
+        """Drop a key (or the whole cache when key is None) here and on every other worker."""
+        self._apply(name, key)
+        if self.redis is None:
+            return
+        message = orjson.dumps({"origin": self.origin, "cache": name, "key": key})
+        try:
+            await self.redis.publish(self.channel, message)
+        except Exception as e:
+            logger.warning(f"Failed to broadcast invalidation of {name}: {e}")
+
+    async def listen(self, retry_delay: float = 1.0):
+        """Apply invalidations published by other workers until cancelled."""
+        while True:
+            try:
+                pubsub = self.redis.pubsub()
+                await pubsub.subscribe(self.channel)
+                # Anything published while we were disconnected is lost, so start cold
+                for name in self._callbacks:
+                    self._apply(name, None)
+                async for message in pubsub.listen():
+                    if message["type"] != "message":
+                        continue
+                    data = orjson.loads(message["data"])
+                    if data["origin"] != self.origin:
+                        self._apply(data["cache"], data["key"])
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Cache invalidation subscriber disconnected: {e}")
+                await asyncio.sleep(retry_delay)
+
+    async def close(self):
+        if self.redis is not None:
+            await self.redis.aclose()
+
+
+class TieredCache:
+    """Read-through cache: a per-process LRU in front of an optional shared redis tier.
+
+    Values must be JSON documents; they are stored in redis as JSON, so datetimes
+    come back as ISO strings. Concurrent misses for a key share one load within a
+    worker, and a short redis lock lets only one worker load it at a time.
+    """
+
+    def __init__(self, name: str, bus: InvalidationBus, maxsize: int = 10000,
+                 ttl: float = 60, local_ttl: Optional[float] = None, lock_timeout: float = 2.0):
+        self.name = name
+        self.bus = bus
+        self.redis = bus.redis
+        self.ttl = ttl
+        self.lock_timeout = lock_timeout
+        self.local = LRUCache(maxsize=maxsize, ttl=local_ttl or ttl, name=f"{name}_local")
+        self._generation = 0
+        self._loading: Dict[str, asyncio.Future] = {}
+        bus.register(name, self._invalidate_local)
+
+    def _invalidate_local(self, key: Optional[str]):
+        # Loads that started before this never store their result
+        self._generation += 1
+        if key is None:
+            self.local.clear()
+        else:
+            self.local.invalidate(key)
+
+    def _redis_key(self, key: str) -> str:
+        return f"cache:{self.name}:{key}"
+
+    async def get_or_load(self, key: str, loader: Callable[[], Awaitable[Any]]) -> Any:
+        value = self.local.get(key, _MISSING)
+        if value is not _MISSING:
+            return value
+        loading = self._loading.get(key)
+        if loading is not None:
+            return await asyncio.shield(loading)
+        future = asyncio.get_running_loop().create_future()
+        self._loading[key] = future
+        generation = self._generation
+        try:
+            value = await self._load_shared(key, loader, generation)
+        except BaseException as e:
+            future.set_exception(e)
+            # Mark the exception retrieved in case nobody else was waiting
+            future.exception()
+            raise
+        finally:
+            self._loading.pop(key, None)
+        future.set_result(value)
+        if value is not None and generation == self._generation:
+            self.local.set(key, value)
+        return value
+
+    async def _load_shared(self, key: str, loader: Callable[[], Awaitable[Any]],
+                           generation: int) -> Any:
+        if self.redis is None:
+            return await loader()
+        redis_key = self._redis_key(key)
+        lock_key = redis_key + ":lock"
+        try:
+            cached = await self.redis.get(redis_key)
+            if cached is not None:
+                record_cache_lookup(self.name, True)
+                return orjson.loads(cached)
+            record_cache_lookup(self.name, False)
+            locked = await self.redis.set(
+                lock_key, self.bus.origin, nx=True, px=int(self.lock_timeout * 1000)
+            )
+            if not locked:
+                # Another worker is loading this key; wait briefly for its result
+                deadline = time.monotonic() + self.lock_timeout
+                while time.monotonic() < deadline:
+                    await asyncio.sleep(0.05)
+                    cached = await self.redis.get(redis_key)
+                    if cached is not None:
+                        return orjson.loads(cached)
+        except Exception as e:
+            logger.warning(f"Redis cache tier unavailable for {self.name}: {e}")
+            return await loader()
+
+        value = await loader()
+        try:
+            if value is not None and generation == self._generation:
+                await self.redis.set(redis_key, dumps(value), ex=int(self.ttl))
+            if locked:
+                await self.redis.delete(lock_key)
+        except Exception as e:
+            logger.warning(f"Failed to populate redis cache tier for {self.name}: {e}")
+        return value
+
+    async def invalidate(self, key: str):
+        # Clear the shared tier first so other workers don't refill from it
+        if self.redis is not None:
+            try:
+                await self.redis.delete(self._redis_key(key))
+            except Exception as e:
+                logger.warning(f"Failed to invalidate redis cache tier for {self.name}: {e}")
+        await self.bus.invalidate(self.name, key)
@@ -0,0 +1,191 @@
+import asyncio
+import logging
+from collections import deque
+from typing import AsyncIterator, Deque, Dict, Iterable, List, NamedTuple, Optional, Set
+
+from pymongo.errors import OperationFailure
+
+from metrics import STREAM_EVENTS, STREAM_SUBSCRIBERS
+from serialization import dumps
+
+
+logger = logging.getLogger(__name__)
+
+# ChangeStreamFatalError and ChangeStreamHistoryLost: the resume token can't be used again
+UNRESUMABLE_ERROR_CODES = {280, 286}
+
+PUBLIC_COLLECTIONS = ("funds", "companies", "deals")
+# Investments are only ever sent to the investor who owns them
+PRIVATE_COLLECTIONS = ("investments",)
+
+
+class FeedEvent(NamedTuple):
+    id: str
+    collection: str
+    operation: str
+    document: dict
+    # Set for private collections, None when every subscriber may see the event
+    user_id: Optional[str]
+
+    def encode(self) -> bytes:
+        return (
+            f"id: {self.id}\nevent: {self.collection}.{self.operation}\n".encode()
+            + b"data: " + dumps(self.document) + b"\n\n"
+        )
+
+
+class Subscriber:
+    """One connected client: a bounded queue, dropped rather than allowed to grow."""
+
+    def __init__(self, user_id: str, collections: Set[str], max_queue: int):
+        self.user_id = user_id
+        self.collections = collections
+        # None wakes the stream so it can notice the feed closing
+        self.queue: "asyncio.Queue[Optional[FeedEvent]]" = asyncio.Queue(maxsize=max_queue)
+        self.overflowed = False
+
+    def wants(self, event: FeedEvent) -> bool:
+        if event.collection not in self.collections:
+            return False
+        return event.user_id is None or event.user_id == self.user_id
+
+
+class ChangeFeed:
+    """Fans MongoDB change stream events out to every streaming client of this worker.
+
+    One watcher per worker, however many clients are connected. Recent events are
+    kept in a ring buffer so a reconnecting client can resume from Last-Event-ID.
+    """
+
+    def __init__(self, fields: Dict[str, Iterable[str]], buffer_size: int = 1000,
+                 max_queue: int = 100, heartbeat_interval: float = 15):
+        # Only these fields per collection are sent, the same ones the API returns
+        self.fields = {collection: frozenset(names) for collection, names in fields.items()}
+        self.max_queue = max_queue
+        self.heartbeat_interval = heartbeat_interval
+        self.available = False
+        self.closed = False
+        self._buffer: Deque[FeedEvent] = deque(maxlen=buffer_size)
+        self._subscribers: Set[Subscriber] = set()
+        self._resume_token: Optional[dict] = None
+
+    def _event_from_change(self, change: dict) -> Optional[FeedEvent]:
+        collection = change["ns"]["coll"]
+        full_document = change.get("fullDocument")
+        if full_document is None:
+            # Deleted before updateLookup could read it
+            return None
+        fields = self.fields[collection]
+        document = {key: value for key, value in full_document.items() if key in fields}
+        user_id = full_document.get("user_id") if collection in PRIVATE_COLLECTIONS else None
+        if collection in PRIVATE_COLLECTIONS and user_id is None:
+            return None
+        return FeedEvent(change["_id"]["_data"], collection, change["operationType"],
+                         document, user_id)
+
+    def publish(self, change: dict):
+        event = self._event_from_change(change)
+        if event is None:
+            return
+        self._buffer.append(event)
+        for subscriber in self._subscribers:
+            if subscriber.overflowed or not subscriber.wants(event):
+                continue
+            try:
+                subscriber.queue.put_nowait(event)
+                STREAM_EVENTS.labels(result="queued").inc()
+            except asyncio.QueueFull:
+                # A client this far behind resyncs instead of holding events in memory
+                subscriber.overflowed = True
+                STREAM_EVENTS.labels(result="overflow").inc()
+
+    async def watch(self, db, retry_delay: float = 1.0, max_retry_delay: float = 60.0):
+        """Follow inserts and updates on the streamed collections until cancelled."""
+        pipeline = [{"$match": {
+            "ns.coll": {"$in": list(PUBLIC_COLLECTIONS + PRIVATE_COLLECTIONS)},
+            "operationType": {"$in": ["insert", "update", "replace"]},
+        }}]
+        delay = retry_delay
+        while True:
+            try:
+                async with db.watch(
+                    pipeline, full_document="updateLookup", resume_after=self._resume_token
+                ) as stream:
+                    # Once closed, new clients are turned away while open ones finish
+                    self.available = not self.closed
+                    delay = retry_delay
+                    async for change in stream:
+                        self._resume_token = change["_id"]
+                        self.publish(change)
+            except Exception as e:
+                # Change streams need a replica set, so a standalone server keeps landing here
+                self.available = False
+                if isinstance(e, OperationFailure) and e.code in UNRESUMABLE_ERROR_CODES:
+                    # Start from now; the gap means buffered ids can't be resumed from either
+                    self._resume_token = None
+                    self._buffer.clear()
+                logger.warning(f"Change stream interrupted, retrying in {delay:.0f}s: {e}")
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, max_retry_delay)
+
+    def close(self):
+        """End every open stream, e.g. when the server starts draining so they don't hold it up."""
+        self.closed = True
+        self.available = False
+        for subscriber in self._subscribers:
+            try:
+                subscriber.queue.put_nowait(None)
+            except asyncio.QueueFull:
+                # Its stream checks closed after each queued event
+                pass
+
+    def _replay(self, last_event_id: Optional[str]) -> Optional[List[FeedEvent]]:
+        """Buffered events after last_event_id, or None when it has left the buffer."""
+        if not last_event_id:
+            return []
+        events = list(self._buffer)
+        for index, event in enumerate(events):
+            if event.id == last_event_id:
+                return events[index + 1:]
+        return None
+
+    async def stream(self, user_id: str, collections: Iterable[str],
+                     last_event_id: Optional[str] = None) -> AsyncIterator[bytes]:
+        """Server-sent events for one client, starting after last_event_id when given."""
+        subscriber = Subscriber(user_id, set(collections), self.max_queue)
+        # Register before replaying so nothing published in between is missed
+        self._subscribers.add(subscriber)
+        STREAM_SUBSCRIBERS.inc()
+        try:
+            yield b"retry: 3000\n\n"
+            replay = self._replay(last_event_id)
+            if replay is None:
+                # Too far behind to resume; the client should refetch its views
+                yield b"event: reset\ndata: {}\n\n"
+                replay = []
+            sent = {event.id for event in replay if subscriber.wants(event)}
+            for event in replay:
+                if event.id in sent:
+                    yield event.encode()
+            while not self.closed:
+                if subscriber.overflowed:
+                    yield b"event: reset\ndata: {}\n\n"
+                    return
+                try:
+                    event = await asyncio.wait_for(
+                        subscriber.queue.get(), timeout=self.heartbeat_interval
+                    )
+                except asyncio.TimeoutError:
+                    # Keeps proxies from closing an idle connection
+                    yield b": keepalive\n\n"
+                    continue
+                if event is None:
+                    continue
+                if event.id in sent:
+                    sent.discard(event.id)
+                    continue
+                yield event.encode()
+                STREAM_EVENTS.labels(result="sent").inc()
+        finally:
+            self._subscribers.discard(subscriber)
+            STREAM_SUBSCRIBERS.dec()
@@ -0,0 +1,48 @@
+import os
+from typing import Optional, Type, TypeVar
+
+from pydantic import BaseModel
+from pymongo import ReturnDocument
+from pymongo.write_concern import WriteConcern
+
+
+ModelT = TypeVar("ModelT", bound=BaseModel)
+
+
+def write_concern_from_env() -> Optional[WriteConcern]:
+    """Build the write concern for API writes, or None to use the client default."""
+    w = os.environ.get("MONGO_WRITE_CONCERN_W")
+    journal = os.environ.get("MONGO_WRITE_CONCERN_J")
+    wtimeout = os.environ.get("MONGO_WRITE_CONCERN_WTIMEOUT_MS")
+    if w is None and journal is None and wtimeout is None:
+        return None
+    return WriteConcern(
+        w=int(w) if w and w.isdigit() else w,
+        j=journal.lower() == "true" if journal is not None else None,
+        wtimeout=int(wtimeout) if wtimeout else None,
+    )
+
+
+async def create_document(collection, model_cls: Type[ModelT], data: dict, *,
+                          write_concern: Optional[WriteConcern] = None,
+                          return_document: bool = False) -> ModelT:
+    """Insert a new document and return it as a model in a single round trip.
+
+    With return_document=True the stored document is returned as the server wrote
+    it, which picks up any fields set on the server side.
+    """
+    obj = model_cls(**data)
+    doc = obj.dict()
+    if write_concern is not None:
+        collection = collection.with_options(write_concern=write_concern)
+    if return_document:
+        stored = await collection.find_one_and_update(
+            {"id": doc["id"]},
+            {"$setOnInsert": doc},
+            projection={"_id": 0},
+            upsert=True,
+            return_document=ReturnDocument.AFTER,
+        )
+        return model_cls(**stored)
+    await collection.insert_one(doc)
+    return obj
@@ -0,0 +1,85 @@
+import logging
+import os
+from typing import Any, Dict
+
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo.read_preferences import (
+    Nearest,
+    Primary,
+    PrimaryPreferred,
+    Secondary,
+    SecondaryPreferred,
+)
+
+from metrics import mongo_command_listener, mongo_pool_listener
+
+
+logger = logging.getLogger(__name__)
+
+READ_PREFERENCES = {
+    "primary": Primary,
+    "primaryPreferred": PrimaryPreferred,
+    "secondary": Secondary,
+    "secondaryPreferred": SecondaryPreferred,
+    "nearest": Nearest,
+}
+
+# Client option -> environment variable, for the integer pool and timeout settings
+_INT_OPTIONS = {
+    "maxPoolSize": "MONGO_MAX_POOL_SIZE",
+    "minPoolSize": "MONGO_MIN_POOL_SIZE",
+    "maxConnecting": "MONGO_MAX_CONNECTING",
+    "maxIdleTimeMS": "MONGO_MAX_IDLE_TIME_MS",
+    "waitQueueTimeoutMS": "MONGO_WAIT_QUEUE_TIMEOUT_MS",
+    "connectTimeoutMS": "MONGO_CONNECT_TIMEOUT_MS",
+    "serverSelectionTimeoutMS": "MONGO_SERVER_SELECTION_TIMEOUT_MS",
+}
+
+
+def client_options_from_env() -> Dict[str, Any]:
+    """Pool sizing, timeouts and wire compression for the Motor client."""
+    options: Dict[str, Any] = {
+        # Bounded defaults so a burst of requests can't open unbounded connections per worker
+        "maxPoolSize": 50,
+        "maxConnecting": 2,
+        "waitQueueTimeoutMS": 5000,
+    }
+    for option, env_var in _INT_OPTIONS.items():
+        value = os.environ.get(env_var)
+        if value:
+            options[option] = int(value)
+    # The server picks the first one it also supports. zstandard is in requirements.txt;
+    # listing one whose library isn't installed makes the driver warn on every start
+    compressors = os.environ.get("MONGO_COMPRESSORS", "zstd,zlib")
+    if compressors:
+        options["compressors"] = compressors
+    return options
+
+
+def read_preference_from_env():
+    """Read preference for read-only endpoints that can tolerate replica lag."""
+    name = os.environ.get("MONGO_READ_PREFERENCE", "secondaryPreferred")
+    if name not in READ_PREFERENCES:
+        raise ValueError(f"Unsupported MongoDB read preference: {name}")
+    if name == "primary":
+        return Primary()
+    max_staleness = int(os.environ.get("MONGO_MAX_STALENESS_SECONDS", -1))
+    return READ_PREFERENCES[name](max_staleness=max_staleness)
+
+
+def create_client(mongo_url: str) -> AsyncIOMotorClient:
+    options = client_options_from_env()
+    logger.info(
+        "Connecting to MongoDB with "
+        + ", ".join(f"{key}={value}" for key, value in sorted(options.items()))
+    )
+    return AsyncIOMotorClient(
+        mongo_url,
+        event_listeners=[mongo_command_listener, mongo_pool_listener],
+        **options,
+    )
+
+
+def read_database(client, name: str):
+    """The same database, routed by the read preference for replica-tolerant reads."""
+    return client.get_database(name, read_preference=read_preference_from_env())
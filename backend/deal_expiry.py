@@ -0,0 +1,124 @@
+import asyncio
+import heapq
+import logging
+from datetime import datetime, timezone
+from typing import Awaitable, Callable, List, Optional, Tuple
+
+from pymongo import ASCENDING
+
+
+logger = logging.getLogger(__name__)
+
+OPEN = "Open"
+CLOSED = "Closed"
+
+
+def utc_naive(value: datetime) -> datetime:
+    """Naive UTC, the way datetimes come back from MongoDB and datetime.utcnow() compares."""
+    if value.tzinfo is not None:
+        return value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+async def close_expired_deals(db, deal_ids: Optional[List[str]] = None) -> List[str]:
+    """Close open deals whose deadline has passed and return the ids this call closed."""
+    now = datetime.utcnow()
+    query = {"status": OPEN, "deadline": {"$lte": now}}
+    if deal_ids is not None:
+        query["id"] = {"$in": deal_ids}
+    expired = [doc["id"] async for doc in db.deals.find(query, {"_id": 0, "id": 1})]
+    if not expired:
+        return []
+    # Guarded on status again so concurrent workers don't both report the same deal
+    closed = []
+    for deal_id in expired:
+        result = await db.deals.update_one(
+            {"id": deal_id, "status": OPEN},
+            {"$set": {"status": CLOSED, "updated_at": now}},
+        )
+        if result.modified_count:
+            closed.append(deal_id)
+    return closed
+
+
+async def backfill_deal_status(db):
+    """Give deals written before they had a status one from their deadline."""
+    now = datetime.utcnow()
+    missing = {"status": {"$exists": False}}
+    await db.deals.update_many(
+        {**missing, "deadline": {"$lte": now}}, {"$set": {"status": CLOSED, "updated_at": now}}
+    )
+    await db.deals.update_many(missing, {"$set": {"status": OPEN}})
+
+
+class DealExpiryScheduler:
+    """Closes deals the moment their deadline passes, from a min-heap of upcoming deadlines.
+
+    Each worker keeps its own heap; closing is guarded on status, so workers racing
+    on the same deal are harmless. Deals created on other workers are picked up by
+    the periodic resync.
+    """
+
+    def __init__(self, on_closed: Callable[[List[str]], Awaitable[None]],
+                 resync_interval: float = 300):
+        self.on_closed = on_closed
+        self.resync_interval = resync_interval
+        self._heap: List[Tuple[datetime, str]] = []
+        self._changed = asyncio.Event()
+
+    def __len__(self):
+        return len(self._heap)
+
+    def schedule(self, deal_id: str, deadline: datetime):
+        heapq.heappush(self._heap, (utc_naive(deadline), deal_id))
+        if self._heap[0][1] == deal_id:
+            # New earliest deadline; wake the runner so it doesn't oversleep
+            self._changed.set()
+
+    async def rebuild(self, db):
+        heap = [
+            (doc["deadline"], doc["id"])
+            async for doc in db.deals.find(
+                {"status": OPEN}, {"_id": 0, "id": 1, "deadline": 1}
+            ).sort("deadline", ASCENDING)
+        ]
+        # Already sorted, which is a valid heap
+        self._heap = heap
+
+    async def _wait(self, timeout: float):
+        changed = asyncio.ensure_future(self._changed.wait())
+        try:
+            await asyncio.wait([changed], timeout=max(timeout, 0))
+        finally:
+            changed.cancel()
+        self._changed.clear()
+
+    async def _close_due(self, db):
+        now = datetime.utcnow()
+        due = []
+        while self._heap and self._heap[0][0] <= now:
+            due.append(heapq.heappop(self._heap)[1])
+        if due:
+            closed = await close_expired_deals(db, due)
+            if closed:
+                logger.info(f"Closed {len(closed)} deals past their deadline")
+                await self.on_closed(closed)
+
+    async def run(self, db):
+        """Rebuild the heap, then sleep until the next deadline, until cancelled."""
+        next_resync = 0.0
+        loop = asyncio.get_running_loop()
+        while True:
+            try:
+                if loop.time() >= next_resync:
+                    await self.rebuild(db)
+                    next_resync = loop.time() + self.resync_interval
+                await self._close_due(db)
+            except Exception as e:
+                logger.error(f"Deal expiry failed: {e}")
+                next_resync = loop.time() + min(self.resync_interval, 5)
+            timeout = next_resync - loop.time()
+            if self._heap:
+                until_deadline = (self._heap[0][0] - datetime.utcnow()).total_seconds()
+                timeout = min(timeout, until_deadline)
+            await self._wait(timeout)
@@ -0,0 +1,28 @@
+import zlib
+from typing import AsyncIterator
+
+from serialization import dumps
+
+
+async def iter_ndjson(collection, query: dict, batch_size: int = 500,
+                      compress: bool = False) -> AsyncIterator[bytes]:
+    """Stream a collection as NDJSON, holding at most one cursor batch in memory."""
+    cursor = collection.find(query, {"_id": 0}).batch_size(batch_size)
+    # wbits=31 writes a gzip container rather than a raw zlib stream
+    compressor = zlib.compressobj(wbits=31) if compress else None
+    lines = []
+    async for doc in cursor:
+        lines.append(dumps(doc))
+        if len(lines) >= batch_size:
+            chunk = b"\n".join(lines) + b"\n"
+            lines = []
+            if compressor:
+                chunk = compressor.compress(chunk)
+                if not chunk:
+                    continue
+            yield chunk
+    chunk = b"\n".join(lines) + b"\n" if lines else b""
+    if compressor:
+        chunk = compressor.compress(chunk) + compressor.flush()
+    if chunk:
+        yield chunk
@@ -0,0 +1,189 @@
+import logging
+import uuid
+from collections import defaultdict
+from datetime import datetime
+from typing import Dict, List
+
+from pymongo import ReplaceOne, UpdateOne
+
+
+logger = logging.getLogger(__name__)
+
+CANCELLED = "Cancelled"
+
+
+def _empty_stats(fund_id: str) -> dict:
+    return {
+        "fund_id": fund_id,
+        "total_committed": 0,
+        "investment_count": 0,
+        "investor_count": 0,
+        "status_counts": {},
+        "status_amounts": {},
+        "updated_at": None,
+        # Bumped by every write, so a reconcile can tell whether it raced one
+        "version": 0,
+    }
+
+
+async def get_fund_stats(db, fund_id: str) -> dict:
+    stats = await db.fund_stats.find_one({"fund_id": fund_id}, {"_id": 0})
+    return stats or _empty_stats(fund_id)
+
+
+async def record_fund_investments(db, investments: List[dict]):
+    """Add newly created investments to their funds' running totals."""
+    if not investments:
+        return
+    # Distinct investors: only a newly inserted (fund, user) pair bumps the count
+    pairs = list({(investment["fund_id"], investment["user_id"]) for investment in investments})
+    result = await db.fund_investors.bulk_write([
+        UpdateOne(
+            {"fund_id": fund_id, "user_id": user_id},
+            {"$setOnInsert": {"fund_id": fund_id, "user_id": user_id}},
+            upsert=True,
+        )
+        for fund_id, user_id in pairs
+    ], ordered=False)
+    new_investors = defaultdict(int)
+    for index in result.upserted_ids:
+        new_investors[pairs[index][0]] += 1
+
+    increments: Dict[str, Dict[str, int]] = defaultdict(lambda: defaultdict(int))
+    for investment in investments:
+        fund_increments = increments[investment["fund_id"]]
+        status = investment["status"]
+        amount = investment["amount"]
+        fund_increments["investment_count"] += 1
+        fund_increments["total_committed"] += 0 if status == CANCELLED else amount
+        fund_increments[f"status_counts.{status}"] += 1
+        fund_increments[f"status_amounts.{status}"] += amount
+    operations = []
+    for fund_id, fund_increments in increments.items():
+        fund_increments["investor_count"] += new_investors.get(fund_id, 0)
+        fund_increments["version"] += 1
+        operations.append(UpdateOne(
+            {"fund_id": fund_id},
+            {"$inc": dict(fund_increments), "$set": {"updated_at": datetime.utcnow()}},
+            upsert=True,
+        ))
+    await db.fund_stats.bulk_write(operations, ordered=False)
+
+
+async def apply_fund_status_change(db, investment: dict, old_status: str, new_status: str):
+    """Move an investment's amount between status buckets of its fund."""
+    if old_status == new_status:
+        return
+    amount = investment["amount"]
+    increments = {
+        f"status_counts.{old_status}": -1,
+        f"status_counts.{new_status}": 1,
+        f"status_amounts.{old_status}": -amount,
+        f"status_amounts.{new_status}": amount,
+        "version": 1,
+    }
+    if old_status == CANCELLED:
+        increments["total_committed"] = amount
+    elif new_status == CANCELLED:
+        increments["total_committed"] = -amount
+    await db.fund_stats.update_one(
+        {"fund_id": investment["fund_id"]},
+        {"$inc": increments, "$set": {"updated_at": datetime.utcnow()}},
+        upsert=True,
+    )
+
+
+async def _stats_versions(db, fund_ids: List[str]) -> Dict[str, dict]:
+    return {
+        doc["fund_id"]: doc
+        async for doc in db.fund_stats.find(
+            {"fund_id": {"$in": fund_ids}},
+            {"_id": 0, "fund_id": 1, "version": 1, "reconcile_id": 1},
+        )
+    }
+
+
+async def _reconcile_batch(db, fund_ids: List[str]) -> List[str]:
+    """Recompute the funds' stats and return those a concurrent write kept from being replaced."""
+    versions = {
+        fund_id: doc.get("version") for fund_id, doc in (await _stats_versions(db, fund_ids)).items()
+    }
+    # Marks this run's replacements, to tell afterwards which ones were skipped
+    reconcile_id = uuid.uuid4().hex
+    stats = {fund_id: _empty_stats(fund_id) for fund_id in fund_ids}
+    by_status = db.investments.aggregate([
+        {"$match": {"fund_id": {"$in": fund_ids}}},
+        {"$group": {
+            "_id": {"fund_id": "$fund_id", "status": "$status"},
+            "amount": {"$sum": "$amount"},
+            "count": {"$sum": 1},
+        }},
+    ])
+    async for group in by_status:
+        fund_stats = stats[group["_id"]["fund_id"]]
+        status = group["_id"]["status"]
+        fund_stats["status_counts"][status] = group["count"]
+        fund_stats["status_amounts"][status] = group["amount"]
+        fund_stats["investment_count"] += group["count"]
+        if status != CANCELLED:
+            fund_stats["total_committed"] += group["amount"]
+
+    pairs = await db.investments.aggregate([
+        {"$match": {"fund_id": {"$in": fund_ids}}},
+        {"$group": {"_id": {"fund_id": "$fund_id", "user_id": "$user_id"}}},
+    ]).to_list(None)
+    for pair in pairs:
+        stats[pair["_id"]["fund_id"]]["investor_count"] += 1
+    if pairs:
+        await db.fund_investors.bulk_write([
+            UpdateOne(pair["_id"], {"$setOnInsert": pair["_id"]}, upsert=True) for pair in pairs
+        ], ordered=False)
+
+    now = datetime.utcnow()
+    operations = []
+    for fund_id, fund_stats in stats.items():
+        if fund_id in versions:
+            # Only if no $inc landed since the versions were read, which it would overwrite
+            version = versions[fund_id]
+            operations.append(ReplaceOne(
+                {"fund_id": fund_id, "version": version},
+                {**fund_stats, "updated_at": now, "version": (version or 0) + 1,
+                 "reconcile_id": reconcile_id},
+            ))
+        else:
+            operations.append(UpdateOne(
+                {"fund_id": fund_id},
+                {"$setOnInsert": {**fund_stats, "updated_at": now}},
+                upsert=True,
+            ))
+    await db.fund_stats.bulk_write(operations, ordered=False)
+    written = await _stats_versions(db, list(versions))
+    return [
+        fund_id for fund_id in versions
+        if written.get(fund_id, {}).get("reconcile_id") != reconcile_id
+    ]
+
+
+async def _reconcile_funds(db, fund_ids: List[str], attempts: int = 3):
+    for _ in range(attempts):
+        fund_ids = await _reconcile_batch(db, fund_ids)
+        if not fund_ids:
+            return
+    logger.warning(f"Fund stats for {len(fund_ids)} funds changed during every reconcile attempt")
+
+
+async def reconcile_fund_stats(db, batch_size: int = 100) -> int:
+    """Recompute every fund's aggregates from the investments collection, in batches."""
+    reconciled = 0
+    batch = []
+    async for fund in db.funds.find({}, {"_id": 0, "id": 1}).batch_size(batch_size):
+        batch.append(fund["id"])
+        if len(batch) >= batch_size:
+            await _reconcile_funds(db, batch)
+            reconciled += len(batch)
+            batch = []
+    if batch:
+        await _reconcile_funds(db, batch)
+        reconciled += len(batch)
+    logger.info(f"Reconciled commitment stats for {reconciled} funds")
+    return reconciled
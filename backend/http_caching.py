@@ -0,0 +1,50 @@
+import hashlib
+from datetime import datetime
+from typing import Dict, Optional
+
+from starlette.requests import Request
+from starlette.responses import Response
+
+
+# Bump when the JSON shape of a cached resource changes so stored ETags stop matching
+REPRESENTATION_VERSION = "1"
+
+PRIVATE_CACHE_CONTROL = "private, no-cache"
+
+
+def body_etag(body: bytes) -> str:
+    return '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+
+
+def document_etag(*parts) -> str:
+    """Strong ETag from the values that change whenever a document does, e.g. id and updated_at."""
+    # isoformat, so a datetime and its JSON round trip through a shared cache agree
+    key = ":".join([REPRESENTATION_VERSION] + [
+        part.isoformat() if isinstance(part, datetime) else str(part) for part in parts
+    ])
+    return '"' + hashlib.sha256(key.encode()).hexdigest()[:32] + '"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    candidates = [candidate.strip() for candidate in if_none_match.split(",")]
+    # If-None-Match uses weak comparison, so W/"x" matches "x"
+    return "*" in candidates or any(
+        candidate.removeprefix("W/") == etag for candidate in candidates
+    )
+
+
+def cache_headers(etag: str, cache_control: str = PRIVATE_CACHE_CONTROL) -> Dict[str, str]:
+    headers = {"ETag": etag, "Cache-Control": cache_control}
+    if cache_control.startswith("private"):
+        headers["Vary"] = "Authorization"
+    return headers
+
+
+def not_modified_response(request: Request, etag: str,
+                          cache_control: str = PRIVATE_CACHE_CONTROL) -> Optional[Response]:
+    """A 304 response when the client already holds this representation, else None."""
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=cache_headers(etag, cache_control))
+    return None
@@ -0,0 +1,160 @@
+import logging
+from typing import Dict, List
+
+from pymongo import ASCENDING, DESCENDING, TEXT, IndexModel
+from pymongo.errors import OperationFailure
+
+
+logger = logging.getLogger(__name__)
+
+
+# Every lookup key the API queries on, per collection
+INDEXES: Dict[str, List[IndexModel]] = {
+    "users": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        IndexModel([("email", ASCENDING)], name="email_unique", unique=True),
+    ],
+    "funds": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        IndexModel([("created_at", DESCENDING), ("id", DESCENDING)], name="created_at_id"),
+        IndexModel(
+            [("fund_type", ASCENDING), ("created_at", DESCENDING), ("id", DESCENDING)],
+            name="fund_type_created_at_id",
+        ),
+        IndexModel(
+            [("status", ASCENDING), ("created_at", DESCENDING), ("id", DESCENDING)],
+            name="status_created_at_id",
+        ),
+        IndexModel([("carry_high_bps", ASCENDING), ("id", ASCENDING)], name="carry_high_bps_id"),
+        IndexModel([("carry_low_bps", ASCENDING)], name="carry_low_bps"),
+        IndexModel(
+            [("management_fee_bps", ASCENDING), ("id", ASCENDING)], name="management_fee_bps_id"
+        ),
+        IndexModel([("updated_at", ASCENDING)], name="updated_at"),
+        IndexModel(
+            [("name", TEXT), ("symbol", TEXT), ("gp_name", TEXT)],
+            name="search_text", weights={"symbol": 4, "name": 3, "gp_name": 1},
+        ),
+    ],
+    "companies": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        IndexModel([("created_at", DESCENDING), ("id", DESCENDING)], name="created_at_id"),
+        IndexModel(
+            [("sector", ASCENDING), ("created_at", DESCENDING), ("id", DESCENDING)],
+            name="sector_created_at_id",
+        ),
+        IndexModel(
+            [("round", ASCENDING), ("created_at", DESCENDING), ("id", DESCENDING)],
+            name="round_created_at_id",
+        ),
+        IndexModel([("valuation_cents", ASCENDING), ("id", ASCENDING)], name="valuation_cents_id"),
+        IndexModel([("updated_at", ASCENDING)], name="updated_at"),
+        IndexModel(
+            [("name", TEXT), ("symbol", TEXT), ("lead_investor", TEXT), ("co_investors", TEXT)],
+            name="search_text",
+            weights={"symbol": 4, "name": 3, "lead_investor": 1, "co_investors": 1},
+        ),
+    ],
+    "deals": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        IndexModel([("created_at", DESCENDING), ("id", DESCENDING)], name="created_at_id"),
+        IndexModel(
+            [("sector", ASCENDING), ("created_at", DESCENDING), ("id", DESCENDING)],
+            name="sector_created_at_id",
+        ),
+        IndexModel(
+            [("round", ASCENDING), ("created_at", DESCENDING), ("id", DESCENDING)],
+            name="round_created_at_id",
+        ),
+        IndexModel([("valuation_cents", ASCENDING), ("id", ASCENDING)], name="valuation_cents_id"),
+        IndexModel(
+            [("status", ASCENDING), ("deadline", ASCENDING), ("id", ASCENDING)],
+            name="status_deadline_id",
+        ),
+        IndexModel(
+            [("status", ASCENDING), ("created_at", DESCENDING), ("id", DESCENDING)],
+            name="status_created_at_id",
+        ),
+        IndexModel([("updated_at", ASCENDING)], name="updated_at"),
+        IndexModel(
+            [("company_name", TEXT), ("symbol", TEXT), ("syndicate", TEXT), ("co_investors", TEXT)],
+            name="search_text",
+            weights={"symbol": 4, "company_name": 3, "syndicate": 1, "co_investors": 1},
+        ),
+    ],
+    "investments": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        IndexModel(
+            [("user_id", ASCENDING), ("created_at", DESCENDING)],
+            name="user_id_created_at",
+        ),
+        IndexModel([("fund_id", ASCENDING)], name="fund_id"),
+    ],
+    "fund_stats": [
+        IndexModel([("fund_id", ASCENDING)], name="fund_id_unique", unique=True),
+    ],
+    "fund_investors": [
+        IndexModel(
+            [("fund_id", ASCENDING), ("user_id", ASCENDING)],
+            name="fund_id_user_id_unique",
+            unique=True,
+        ),
+    ],
+    "portfolios": [
+        IndexModel([("user_id", ASCENDING)], name="user_id_unique", unique=True),
+    ],
+}
+
+
+async def ensure_indexes(db) -> Dict[str, Dict[str, List[str]]]:
+    """Create any declared index that is missing. Safe to run on every startup."""
+    report = {}
+    for collection_name, indexes in INDEXES.items():
+        collection = db[collection_name]
+        existing = await collection.index_information()
+        missing = [index for index in indexes if index.document["name"] not in existing]
+        created = []
+        failed = []
+        for index in missing:
+            name = index.document["name"]
+            try:
+                await collection.create_indexes([index])
+                created.append(name)
+            except OperationFailure as e:
+                # Usually duplicate values under a unique index; leave it for an operator
+                logger.error(f"Could not create index {collection_name}.{name}: {e}")
+                failed.append(name)
+        declared = {index.document["name"] for index in indexes}
+        undeclared = [name for name in existing if name != "_id_" and name not in declared]
+        report[collection_name] = {
+            "created": created,
+            "failed": failed,
+            "undeclared": undeclared,
+        }
+        if created:
+            logger.info(f"Created indexes on {collection_name}: {', '.join(created)}")
+        if undeclared:
+            logger.info(f"Indexes on {collection_name} not declared by the API: {', '.join(undeclared)}")
+    return report
+
+
+async def index_usage_report(db) -> Dict[str, Dict[str, List[str]]]:
+    """Report declared indexes that are missing and indexes with no recorded use."""
+    report = {}
+    for collection_name, indexes in INDEXES.items():
+        collection = db[collection_name]
+        existing = await collection.index_information()
+        missing = [
+            index.document["name"] for index in indexes if index.document["name"] not in existing
+        ]
+        try:
+            stats = await collection.aggregate([{"$indexStats": {}}]).to_list(None)
+        except OperationFailure as e:
+            logger.warning(f"$indexStats unavailable for {collection_name}: {e}")
+            stats = []
+        unused = [
+            stat["name"] for stat in stats
+            if stat["name"] != "_id_" and stat.get("accesses", {}).get("ops", 0) == 0
+        ]
+        report[collection_name] = {"missing": missing, "unused": unused}
+    return report
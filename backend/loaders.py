@@ -0,0 +1,114 @@
+import asyncio
+from typing import Dict, Iterable, List, Optional, Set, Tuple, Type
+
+from pydantic import BaseModel
+
+from serialization import model_projection, trusted_documents
+
+
+# include= name -> (collection, foreign key on the including document)
+Includes = Dict[str, Tuple[str, str]]
+
+
+class Loader:
+    """Batches id lookups on one collection into a single $in query, DataLoader style.
+
+    Every load() made before the event loop gets back to the loader shares one query,
+    and results are memoized, so each id is read at most once per loader.
+    """
+
+    def __init__(self, collection, model: Optional[Type[BaseModel]] = None,
+                 projection: Optional[dict] = None):
+        self.collection = collection
+        self.model = model
+        self.projection = projection or model_projection(model)
+        # Only documents read with the model's own projection can skip validation
+        self._trusted = projection is None and model is not None
+        self._futures: Dict[str, asyncio.Future] = {}
+        self._pending: List[str] = []
+        self._batches: Set[asyncio.Task] = set()
+
+    def load(self, doc_id: str) -> "asyncio.Future[Optional[dict]]":
+        future = self._futures.get(doc_id)
+        if future is not None and not future.cancelled():
+            return future
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._futures[doc_id] = future
+        if not self._pending:
+            # Runs after the callbacks already queued, so sibling loads join this batch
+            loop.call_soon(self._start_batch)
+        self._pending.append(doc_id)
+        return future
+
+    async def load_many(self, doc_ids: Iterable[Optional[str]]) -> List[Optional[dict]]:
+        """Documents for doc_ids in order, None for missing ids or where an id is empty."""
+        futures = [self.load(doc_id) if doc_id else None for doc_id in doc_ids]
+        return [await future if future is not None else None for future in futures]
+
+    def _start_batch(self):
+        ids, self._pending = self._pending, []
+        task = asyncio.create_task(self._load_batch(ids))
+        self._batches.add(task)
+        task.add_done_callback(self._batches.discard)
+
+    async def _load_batch(self, ids: List[str]):
+        try:
+            docs = await self.collection.find(
+                {"id": {"$in": ids}}, self.projection
+            ).to_list(len(ids))
+        except Exception as e:
+            for doc_id in ids:
+                # Not memoized, so a later load retries
+                future = self._futures.pop(doc_id)
+                if not future.done():
+                    future.set_exception(e)
+            return
+        if self._trusted:
+            docs = trusted_documents(self.model, docs)
+        found = {doc["id"]: doc for doc in docs}
+        for doc_id in ids:
+            future = self._futures[doc_id]
+            if not future.done():
+                future.set_result(found.get(doc_id))
+
+
+class Loaders:
+    """One request's loaders, a Loader per collection created on first use."""
+
+    def __init__(self, db, models: Dict[str, Type[BaseModel]]):
+        self.db = db
+        self.models = models
+        self._loaders: Dict[str, Loader] = {}
+
+    def __getitem__(self, collection: str) -> Loader:
+        loader = self._loaders.get(collection)
+        if loader is None:
+            loader = Loader(self.db[collection], self.models[collection])
+            self._loaders[collection] = loader
+        return loader
+
+
+def parse_includes(include: Optional[str], allowed: Includes) -> Includes:
+    """Turn a comma separated include= parameter into the relations to embed."""
+    if not include:
+        return {}
+    requested = [name.strip() for name in include.split(",") if name.strip()]
+    unknown = [name for name in requested if name not in allowed]
+    if unknown:
+        raise ValueError(f"Unknown include: {', '.join(unknown)}")
+    return {name: allowed[name] for name in requested}
+
+
+async def embed_related(loaders: Loaders, docs: List[dict], includes: Includes):
+    """Set doc[name] to each include's related document, one query per collection."""
+
+    async def embed(name: str, collection: str, foreign_key: str):
+        related = await loaders[collection].load_many(doc.get(foreign_key) for doc in docs)
+        for doc, value in zip(docs, related):
+            doc[name] = value
+
+    await asyncio.gather(*(
+        embed(name, collection, foreign_key)
+        for name, (collection, foreign_key) in includes.items()
+    ))
@@ -0,0 +1,233 @@
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+from pymongo import common, monitoring
+from starlette.routing import Match
+
+
+REQUEST_COUNT = Counter(
+    "http_requests_total", "HTTP requests by route and status", ["method", "route", "status"]
+)
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds", "HTTP request latency by route", ["method", "route"]
+)
+OPERATION_LATENCY = Histogram(
+    "operation_duration_seconds", "Latency of instrumented code paths", ["operation"]
+)
+MONGO_COMMAND_LATENCY = Histogram(
+    "mongodb_command_duration_seconds",
+    "MongoDB command latency by collection and command",
+    ["collection", "command"],
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5),
+)
+MONGO_COMMAND_FAILURES = Counter(
+    "mongodb_command_failures_total", "Failed MongoDB commands", ["collection", "command"]
+)
+PASSWORD_HASH_LATENCY = Histogram(
+    "password_hash_duration_seconds",
+    "bcrypt hash/verify time on the worker pool, excluding queueing",
+    ["operation"],
+    buckets=(0.05, 0.1, 0.2, 0.3, 0.5, 0.75, 1.0, 2.0, 5.0),
+)
+PASSWORD_HASH_QUEUE_DEPTH = Gauge(
+    "password_hash_queue_depth", "Hash jobs waiting for a worker", multiprocess_mode="livesum"
+)
+MONGO_POOL_CONNECTIONS = Gauge(
+    "mongodb_pool_connections", "Open pooled connections by server",
+    ["address"], multiprocess_mode="livesum"
+)
+MONGO_POOL_CHECKED_OUT = Gauge(
+    "mongodb_pool_checked_out_connections", "Connections currently checked out by server",
+    ["address"], multiprocess_mode="livesum"
+)
+MONGO_POOL_MAX_SIZE = Gauge(
+    "mongodb_pool_max_size", "Configured maxPoolSize per server, summed across workers",
+    ["address"], multiprocess_mode="livesum"
+)
+MONGO_POOL_CHECKOUT_WAIT = Histogram(
+    "mongodb_pool_checkout_wait_seconds", "Time spent waiting for a pooled connection",
+    ["address"],
+    buckets=(0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0),
+)
+MONGO_POOL_CHECKOUT_FAILURES = Counter(
+    "mongodb_pool_checkout_failures_total", "Failed connection checkouts by reason",
+    ["address", "reason"]
+)
+RATE_LIMIT_DECISIONS = Counter(
+    "rate_limit_decisions_total", "Rate limiter decisions by action and key type",
+    ["action", "key_type", "result"]
+)
+CACHE_REQUESTS = Counter(
+    "cache_requests_total", "Cache lookups by cache and result", ["cache", "result"]
+)
+STREAM_SUBSCRIBERS = Gauge(
+    "stream_subscribers", "Connected live update streams", multiprocess_mode="livesum"
+)
+STREAM_EVENTS = Counter(
+    "stream_events_total", "Live update events by result", ["result"]
+)
+
+
+@contextmanager
+def track_duration(operation: str):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        OPERATION_LATENCY.labels(operation=operation).observe(time.perf_counter() - start)
+
+
+def record_cache_lookup(cache: str, hit: bool):
+    CACHE_REQUESTS.labels(cache=cache, result="hit" if hit else "miss").inc()
+
+
+class MongoCommandListener(monitoring.CommandListener):
+    """Times every command Motor sends, labelled by collection and command name."""
+
+    def __init__(self):
+        self._pending = {}
+
+    def started(self, event):
+        collection = event.command.get(event.command_name)
+        if event.command_name == "getMore":
+            collection = event.command.get("collection")
+        if not isinstance(collection, str):
+            collection = ""
+        self._pending[(event.connection_id, event.request_id)] = collection
+
+    def _collection(self, event) -> str:
+        return self._pending.pop((event.connection_id, event.request_id), "")
+
+    def succeeded(self, event):
+        MONGO_COMMAND_LATENCY.labels(
+            collection=self._collection(event), command=event.command_name
+        ).observe(event.duration_micros / 1_000_000)
+
+    def failed(self, event):
+        collection = self._collection(event)
+        MONGO_COMMAND_LATENCY.labels(collection=collection, command=event.command_name) \
+            .observe(event.duration_micros / 1_000_000)
+        MONGO_COMMAND_FAILURES.labels(collection=collection, command=event.command_name).inc()
+
+
+mongo_command_listener = MongoCommandListener()
+
+
+def _address(event) -> str:
+    host, port = event.address
+    return f"{host}:{port}"
+
+
+class MongoPoolListener(monitoring.ConnectionPoolListener):
+    """Tracks pool size, checked-out connections and checkout waits per server."""
+
+    def __init__(self):
+        # Checkout start and completion are published on the same thread
+        self._local = threading.local()
+        self._max_sizes = {}
+
+    def pool_created(self, event):
+        # Options only lists settings that differ from the driver defaults
+        max_size = event.options.get("maxPoolSize", common.MAX_POOL_SIZE)
+        self._max_sizes[event.address] = max_size
+        MONGO_POOL_MAX_SIZE.labels(address=_address(event)).inc(max_size)
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        pass
+
+    def pool_closed(self, event):
+        MONGO_POOL_MAX_SIZE.labels(address=_address(event)).dec(
+            self._max_sizes.pop(event.address, 0)
+        )
+
+    def connection_created(self, event):
+        MONGO_POOL_CONNECTIONS.labels(address=_address(event)).inc()
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        MONGO_POOL_CONNECTIONS.labels(address=_address(event)).dec()
+
+    def connection_check_out_started(self, event):
+        self._local.started = time.perf_counter()
+
+    def _observe_wait(self, event):
+        started = getattr(self._local, "started", None)
+        if started is not None:
+            MONGO_POOL_CHECKOUT_WAIT.labels(address=_address(event)) \
+                .observe(time.perf_counter() - started)
+            self._local.started = None
+
+    def connection_check_out_failed(self, event):
+        self._observe_wait(event)
+        MONGO_POOL_CHECKOUT_FAILURES.labels(address=_address(event), reason=event.reason).inc()
+
+    def connection_checked_out(self, event):
+        self._observe_wait(event)
+        MONGO_POOL_CHECKED_OUT.labels(address=_address(event)).inc()
+
+    def connection_checked_in(self, event):
+        MONGO_POOL_CHECKED_OUT.labels(address=_address(event)).dec()
+
+
+mongo_pool_listener = MongoPoolListener()
+
+
+def _route_template(scope) -> str:
+    # Label by the route's path template so ids don't explode label cardinality
+    app = scope.get("app")
+    for route in getattr(getattr(app, "router", None), "routes", []):
+        match, _ = route.matches(scope)
+        if match == Match.FULL:
+            return getattr(route, "path", "unmatched")
+    return "unmatched"
+
+
+class PrometheusMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        start = time.perf_counter()
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = _route_template(scope)
+            method = scope["method"]
+            REQUEST_LATENCY.labels(method=method, route=route).observe(time.perf_counter() - start)
+            REQUEST_COUNT.labels(method=method, route=route, status=str(status_code)).inc()
+
+
+def render_metrics():
+    """Latest metrics in the Prometheus text format, merged across workers when multiprocess."""
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(), CONTENT_TYPE_LATEST
@@ -0,0 +1,97 @@
+import asyncio
+import logging
+import os
+import socket
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, List, NamedTuple, Sequence
+
+from pymongo.errors import DuplicateKeyError
+
+
+logger = logging.getLogger(__name__)
+
+LOCK_ID = "schema_migrations"
+
+
+class Migration(NamedTuple):
+    id: str
+    description: str
+    run: Callable[[Any], Awaitable[Any]]
+
+
+class MigrationLock:
+    """A lease in the migration_locks collection, so one process migrates at a time.
+
+    The lease expires after ttl seconds, so a crashed holder can't block migrations forever.
+    """
+
+    def __init__(self, db, ttl: float = 60):
+        self.db = db
+        self.ttl = ttl
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+    async def acquire(self) -> bool:
+        now = datetime.utcnow()
+        try:
+            # Matches a lapsed or already-held lease; otherwise the upsert hits the
+            # existing _id and fails, meaning someone else holds it
+            await self.db.migration_locks.update_one(
+                {"_id": LOCK_ID, "$or": [{"expires_at": {"$lt": now}}, {"owner": self.owner}]},
+                {"$set": {"owner": self.owner, "expires_at": now + timedelta(seconds=self.ttl)}},
+                upsert=True,
+            )
+            return True
+        except DuplicateKeyError:
+            return False
+
+    async def keep_alive(self):
+        while True:
+            await asyncio.sleep(self.ttl / 3)
+            await self.acquire()
+
+    async def release(self):
+        await self.db.migration_locks.delete_one({"_id": LOCK_ID, "owner": self.owner})
+
+
+async def pending_migrations(db, migrations: Sequence[Migration]) -> List[Migration]:
+    applied = {doc["_id"] async for doc in db.schema_migrations.find({}, {"_id": 1})}
+    return [migration for migration in migrations if migration.id not in applied]
+
+
+async def run_migrations(db, migrations: Sequence[Migration], lock_ttl: float = 60,
+                         poll_interval: float = 1.0) -> List[str]:
+    """Apply pending migrations in order, once per database, and return the ids applied here.
+
+    Once everything is applied this is a single query on schema_migrations.
+    """
+    if not await pending_migrations(db, migrations):
+        return []
+    lock = MigrationLock(db, ttl=lock_ttl)
+    while not await lock.acquire():
+        # Another process is migrating; wait for it to finish or for its lease to lapse
+        await asyncio.sleep(poll_interval)
+        if not await pending_migrations(db, migrations):
+            return []
+
+    keep_alive = asyncio.create_task(lock.keep_alive())
+    applied = []
+    try:
+        # Re-read under the lock, the previous holder may have applied some of them
+        for migration in await pending_migrations(db, migrations):
+            logger.info(f"Applying migration {migration.id}: {migration.description}")
+            start = time.perf_counter()
+            await migration.run(db)
+            await db.schema_migrations.insert_one({
+                "_id": migration.id,
+                "description": migration.description,
+                "applied_at": datetime.utcnow(),
+                "duration_ms": round((time.perf_counter() - start) * 1000),
+                "applied_by": lock.owner,
+            })
+            applied.append(migration.id)
+    finally:
+        keep_alive.cancel()
+        await lock.release()
+    return applied
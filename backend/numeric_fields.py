@@ -0,0 +1,124 @@
+import logging
+import re
+from decimal import Decimal, InvalidOperation
+from typing import Dict, Optional, Tuple
+
+from pymongo import UpdateOne
+
+
+logger = logging.getLogger(__name__)
+
+_MONEY_RE = re.compile(r"^\s*\$?\s*([\d,]*\.?\d+)\s*([KMBT])?\s*$", re.IGNORECASE)
+_PERCENT_RANGE_RE = re.compile(r"^\s*(\d*\.?\d+)\s*%?\s*(?:-|to)\s*(\d*\.?\d+)\s*%\s*$", re.IGNORECASE)
+_PERCENT_RE = re.compile(r"^\s*(\d*\.?\d+)\s*%")
+_TERM_RE = re.compile(r"for\s+(\d+)\s*years?", re.IGNORECASE)
+
+_MULTIPLIERS = {
+    "K": Decimal(1_000),
+    "M": Decimal(1_000_000),
+    "B": Decimal(1_000_000_000),
+    "T": Decimal(1_000_000_000_000),
+}
+
+
+def _percent_to_bps(value: str) -> int:
+    return int(Decimal(value) * 100)
+
+
+def parse_money_cents(value: Optional[str]) -> Optional[int]:
+    """"$6.08B" -> 608000000000"""
+    match = _MONEY_RE.match(value or "")
+    if not match:
+        return None
+    try:
+        amount = Decimal(match.group(1).replace(",", ""))
+    except InvalidOperation:
+        return None
+    if match.group(2):
+        amount *= _MULTIPLIERS[match.group(2).upper()]
+    return int(amount * 100)
+
+
+def parse_percent_range_bps(value: Optional[str]) -> Tuple[Optional[int], Optional[int]]:
+    """"20-30%" -> (2000, 3000), "20%" -> (2000, 2000)"""
+    value = value or ""
+    match = _PERCENT_RANGE_RE.match(value)
+    if match:
+        return _percent_to_bps(match.group(1)), _percent_to_bps(match.group(2))
+    match = _PERCENT_RE.match(value)
+    if match:
+        bps = _percent_to_bps(match.group(1))
+        return bps, bps
+    return None, None
+
+
+def parse_management_fee(value: Optional[str]) -> Tuple[Optional[int], Optional[int]]:
+    """"2% for 10 years" -> (200, 10)"""
+    value = value or ""
+    match = _PERCENT_RE.match(value)
+    rate_bps = _percent_to_bps(match.group(1)) if match else None
+    term = _TERM_RE.search(value)
+    return rate_bps, int(term.group(1)) if term else None
+
+
+def numeric_fields_for(collection_name: str, doc: dict) -> Dict[str, Optional[int]]:
+    """Parsed numeric shadow fields for a fund, company or deal document."""
+    if collection_name == "funds":
+        carry_low, carry_high = parse_percent_range_bps(doc.get("carry"))
+        fee_bps, fee_years = parse_management_fee(doc.get("management_fee"))
+        return {
+            "carry_low_bps": carry_low,
+            "carry_high_bps": carry_high,
+            "management_fee_bps": fee_bps,
+            "management_fee_years": fee_years,
+        }
+    if collection_name in ("companies", "deals"):
+        return {"valuation_cents": parse_money_cents(doc.get("valuation"))}
+    return {}
+
+
+def add_range_filter(query: dict, field: str, minimum=None, maximum=None):
+    """Add inclusive bounds on a numeric field to a query; None leaves that side open."""
+    bounds = {}
+    if minimum is not None:
+        bounds["$gte"] = minimum
+    if maximum is not None:
+        bounds["$lte"] = maximum
+    if bounds:
+        query.setdefault(field, {}).update(bounds)
+
+
+# The field whose absence marks a document as not yet backfilled
+_BACKFILL_MARKERS = {
+    "funds": "carry_low_bps",
+    "companies": "valuation_cents",
+    "deals": "valuation_cents",
+}
+
+
+async def backfill_numeric_fields(db, batch_size: int = 500) -> Dict[str, int]:
+    """Populate numeric shadow fields on documents written before they existed."""
+    updated = {}
+    for collection_name, marker in _BACKFILL_MARKERS.items():
+        collection = db[collection_name]
+        count = 0
+        cursor = collection.find(
+            {marker: {"$exists": False}},
+            {"_id": 1, "carry": 1, "management_fee": 1, "valuation": 1},
+        ).batch_size(batch_size)
+        operations = []
+        async for doc in cursor:
+            operations.append(
+                UpdateOne({"_id": doc["_id"]}, {"$set": numeric_fields_for(collection_name, doc)})
+            )
+            if len(operations) >= batch_size:
+                await collection.bulk_write(operations, ordered=False)
+                count += len(operations)
+                operations = []
+        if operations:
+            await collection.bulk_write(operations, ordered=False)
+            count += len(operations)
+        if count:
+            logger.info(f"Backfilled numeric fields on {count} {collection_name}")
+        updated[collection_name] = count
+    return updated
@@ -0,0 +1,89 @@
+import base64
+import json
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from pymongo import ASCENDING, DESCENDING
+
+
+def _encode_value(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return {"$date": value.isoformat()}
+    return value
+
+
+def _decode_value(value: Any) -> Any:
+    if isinstance(value, dict):
+        # The only object a cursor holds; anything else could smuggle in a query operator
+        if set(value) != {"$date"} or not isinstance(value["$date"], str):
+            raise ValueError("Invalid cursor")
+        return datetime.fromisoformat(value["$date"])
+    if isinstance(value, list):
+        raise ValueError("Invalid cursor")
+    return value
+
+
+def encode_cursor(doc: Dict[str, Any], sort_field: str) -> str:
+    raw = json.dumps([_encode_value(doc.get(sort_field)), doc["id"]], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[Any, str]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        decoded = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        if not isinstance(decoded, list) or len(decoded) != 2 or not isinstance(decoded[1], str):
+            raise ValueError("Invalid cursor")
+        return _decode_value(decoded[0]), decoded[1]
+    except (ValueError, TypeError):
+        raise ValueError("Invalid cursor")
+
+
+def keyset_filter(sort_field: str, descending: bool, value: Any, doc_id: str) -> Dict[str, Any]:
+    """Match documents strictly after (value, id) in the (sort_field, id) ordering."""
+    op = "$lt" if descending else "$gt"
+    return {
+        "$or": [
+            {sort_field: {op: value}},
+            {sort_field: value, "id": {op: doc_id}},
+        ]
+    }
+
+
+def build_projection(fields: Optional[str], allowed: Iterable[str],
+                     required: Iterable[str] = ("id", "created_at")) -> Optional[Dict[str, int]]:
+    """Turn a comma separated fields= parameter into a MongoDB projection."""
+    if not fields:
+        return None
+    requested = [field.strip() for field in fields.split(",") if field.strip()]
+    allowed = set(allowed)
+    unknown = [field for field in requested if field not in allowed]
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+    projection = {"_id": 0}
+    for field in list(required) + requested:
+        projection[field] = 1
+    return projection
+
+
+async def fetch_page(collection, query: Dict[str, Any], *, limit: int,
+                     cursor: Optional[str] = None, sort_field: str = "created_at",
+                     descending: bool = True,
+                     projection: Optional[Dict[str, int]] = None) -> Tuple[List[dict], Optional[str]]:
+    """Fetch one keyset page ordered by (sort_field, id) and the cursor for the next one."""
+    if cursor:
+        value, doc_id = decode_cursor(cursor)
+        query = {"$and": [query, keyset_filter(sort_field, descending, value, doc_id)]}
+    direction = DESCENDING if descending else ASCENDING
+    if projection is not None and sort_field not in projection:
+        projection = {**projection, sort_field: 1}
+    # Read one extra row to know whether another page exists
+    docs = await collection.find(query, projection) \
+        .sort([(sort_field, direction), ("id", direction)]) \
+        .limit(limit + 1) \
+        .to_list(limit + 1)
+    next_cursor = None
+    if len(docs) > limit:
+        docs = docs[:limit]
+        next_cursor = encode_cursor(docs[-1], sort_field)
+    return docs, next_cursor
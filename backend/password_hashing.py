@@ -0,0 +1,87 @@
+import asyncio
+import os
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Optional
+
+from passlib.context import CryptContext
+
+from metrics import PASSWORD_HASH_LATENCY, PASSWORD_HASH_QUEUE_DEPTH
+
+
+# Password hashing
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+
+
+def _hash_password(password: str) -> str:
+    return pwd_context.hash(password)
+
+
+def _verify_password(plain_password: str, hashed_password: str) -> bool:
+    return pwd_context.verify(plain_password, hashed_password)
+
+
+class PasswordHasher:
+    """Runs bcrypt off the event loop on a bounded worker pool."""
+
+    def __init__(self, executor_type: str = "thread", max_workers: Optional[int] = None,
+                 max_concurrency: Optional[int] = None):
+        if executor_type not in ("thread", "process"):
+            raise ValueError(f"Unsupported password hash executor: {executor_type}")
+        self.executor_type = executor_type
+        self.max_workers = max_workers or min(4, os.cpu_count() or 1)
+        # Never admit more jobs than workers; anything above that just queues in the pool
+        self.max_concurrency = max_concurrency or self.max_workers
+        self._executor: Optional[Executor] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+    @classmethod
+    def from_env(cls):
+        workers = os.environ.get("PASSWORD_HASH_WORKERS")
+        concurrency = os.environ.get("PASSWORD_HASH_MAX_CONCURRENCY")
+        return cls(
+            executor_type=os.environ.get("PASSWORD_HASH_EXECUTOR", "thread"),
+            max_workers=int(workers) if workers else None,
+            max_concurrency=int(concurrency) if concurrency else None,
+        )
+
+    def _get_executor(self) -> Executor:
+        if self._executor is None:
+            if self.executor_type == "process":
+                self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+            else:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.max_workers, thread_name_prefix="password-hash"
+                )
+        return self._executor
+
+    def _get_semaphore(self) -> asyncio.Semaphore:
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._semaphore
+
+    async def _run(self, operation: str, func, *args):
+        semaphore = self._get_semaphore()
+        PASSWORD_HASH_QUEUE_DEPTH.inc()
+        try:
+            await semaphore.acquire()
+        finally:
+            PASSWORD_HASH_QUEUE_DEPTH.dec()
+        start = time.perf_counter()
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._get_executor(), func, *args)
+        finally:
+            PASSWORD_HASH_LATENCY.labels(operation=operation).observe(time.perf_counter() - start)
+            semaphore.release()
+
+    async def hash(self, password: str) -> str:
+        return await self._run("hash", _hash_password, password)
+
+    async def verify(self, plain_password: str, hashed_password: str) -> bool:
+        return await self._run("verify", _verify_password, plain_password, hashed_password)
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
@@ -0,0 +1,262 @@
+import asyncio
+import logging
+from collections import defaultdict
+from datetime import datetime
+from typing import Dict, List, Sequence, Set
+
+from pymongo import ReplaceOne, UpdateOne
+from pymongo.errors import BulkWriteError
+
+from loaders import Loader
+
+
+logger = logging.getLogger(__name__)
+
+
+CANCELLED = "Cancelled"
+
+FUND_ROW_PROJECTION = {"_id": 0, "id": 1, "name": 1, "symbol": 1, "min_investment": 1, "carry": 1}
+
+
+def investment_row(investment: dict, fund: dict) -> dict:
+    """An investment with the fund fields the LP dashboard shows, denormalized."""
+    return {
+        "id": investment["id"],
+        "amount": investment["amount"],
+        "status": investment["status"],
+        "created_at": investment["created_at"],
+        "fund_id": investment["fund_id"],
+        "fund_name": fund.get("name"),
+        "fund_symbol": fund.get("symbol"),
+        "min_investment": fund.get("min_investment"),
+        "carry": fund.get("carry"),
+    }
+
+
+def _committed(row: dict) -> int:
+    return 0 if row["status"] == CANCELLED else row["amount"]
+
+
+def _summarize(user_id: str, rows: List[dict]) -> dict:
+    status_counts = defaultdict(int)
+    status_amounts = defaultdict(int)
+    funds: Dict[str, dict] = {}
+    for row in rows:
+        status_counts[row["status"]] += 1
+        status_amounts[row["status"]] += row["amount"]
+        fund = funds.setdefault(row["fund_id"], {
+            "fund_id": row["fund_id"],
+            "fund_name": row["fund_name"],
+            "fund_symbol": row["fund_symbol"],
+            "committed": 0,
+            "investment_count": 0,
+        })
+        fund["committed"] += _committed(row)
+        fund["investment_count"] += 1
+    return {
+        "user_id": user_id,
+        "total_committed": sum(_committed(row) for row in rows),
+        "investment_count": len(rows),
+        "status_counts": dict(status_counts),
+        "status_amounts": dict(status_amounts),
+        "funds": funds,
+        "investments": rows,
+        "updated_at": datetime.utcnow(),
+        # Bumped by every write, so a rebuild can tell whether it raced one
+        "version": 0,
+    }
+
+
+async def _build_portfolios(db, user_ids: Sequence[str]) -> Dict[str, dict]:
+    """Compute portfolios from the investments collection, one query per collection."""
+    investments = await db.investments.find(
+        {"user_id": {"$in": list(user_ids)}}, {"_id": 0}
+    ).sort("created_at", 1).to_list(None)
+    funds = await Loader(db.funds, projection=FUND_ROW_PROJECTION).load_many(
+        investment["fund_id"] for investment in investments
+    )
+    rows = defaultdict(list)
+    for investment, fund in zip(investments, funds):
+        # Investments whose fund is gone are left out, as they always have been
+        if fund is not None:
+            rows[investment["user_id"]].append(investment_row(investment, fund))
+    return {user_id: _summarize(user_id, rows[user_id]) for user_id in user_ids}
+
+
+async def _insert_portfolios(db, portfolios: Dict[str, dict]) -> Set[str]:
+    """Insert portfolios that don't exist yet and return the users whose insert won.
+
+    Never overwrites, so increments applied to a concurrently created portfolio survive.
+    """
+    user_ids = list(portfolios)
+    try:
+        await db.portfolios.insert_many([portfolios[user_id] for user_id in user_ids], ordered=False)
+        failed = set()
+    except BulkWriteError as e:
+        if any(error["code"] != 11000 for error in e.details.get("writeErrors", [])):
+            raise
+        failed = {user_ids[error["index"]] for error in e.details["writeErrors"]}
+    for portfolio in portfolios.values():
+        portfolio.pop("_id", None)
+    return set(user_ids) - failed
+
+
+async def get_portfolio(db, user_id: str, exclude: Sequence[str] = ()) -> dict:
+    projection = {"_id": 0, **{field: 0 for field in exclude}}
+    portfolio = await db.portfolios.find_one({"user_id": user_id}, projection)
+    if portfolio is None:
+        # First read for a user whose investments predate materialized portfolios
+        portfolio = (await _build_portfolios(db, [user_id]))[user_id]
+        if not await _insert_portfolios(db, {user_id: portfolio}):
+            # Created by a concurrent request; read theirs, it may have taken increments since
+            return await db.portfolios.find_one({"user_id": user_id}, projection)
+        for field in exclude:
+            portfolio.pop(field, None)
+    return portfolio
+
+
+def _unrecorded(user_id: str, rows: List[dict]) -> dict:
+    # Skips a portfolio that a concurrent rebuild already built with these rows in it
+    return {"user_id": user_id, "investments.id": {"$nin": [row["id"] for row in rows]}}
+
+
+def _record(rows: List[dict]) -> dict:
+    increments = defaultdict(int)
+    fund_fields = {}
+    for row in rows:
+        increments["investment_count"] += 1
+        increments["total_committed"] += _committed(row)
+        increments[f"status_counts.{row['status']}"] += 1
+        increments[f"status_amounts.{row['status']}"] += row["amount"]
+        increments[f"funds.{row['fund_id']}.committed"] += _committed(row)
+        increments[f"funds.{row['fund_id']}.investment_count"] += 1
+        fund_fields[f"funds.{row['fund_id']}.fund_id"] = row["fund_id"]
+        fund_fields[f"funds.{row['fund_id']}.fund_name"] = row["fund_name"]
+        fund_fields[f"funds.{row['fund_id']}.fund_symbol"] = row["fund_symbol"]
+    increments["version"] += 1
+    return {
+        "$inc": dict(increments),
+        "$push": {"investments": {"$each": rows}},
+        "$set": {**fund_fields, "updated_at": datetime.utcnow()},
+    }
+
+
+async def record_investments(db, user_id: str, rows: List[dict]):
+    """Fold newly created investments into the user's portfolio."""
+    if not rows:
+        return
+    while True:
+        result = await db.portfolios.update_one(_unrecorded(user_id, rows), _record(rows))
+        if result.matched_count or await db.portfolios.count_documents({"user_id": user_id}, limit=1):
+            return
+        # No portfolio yet; one built now already includes these rows. If another
+        # request creates it first, go round and add the rows to theirs
+        if await _insert_portfolios(db, await _build_portfolios(db, [user_id])):
+            return
+
+
+async def record_investments_many(db, rows_by_user: Dict[str, List[dict]]):
+    """record_investments for many users with one write for those who have a portfolio."""
+    if not rows_by_user:
+        return
+    existing = {
+        doc["user_id"]
+        async for doc in db.portfolios.find(
+            {"user_id": {"$in": list(rows_by_user)}}, {"_id": 0, "user_id": 1}
+        )
+    }
+    if existing:
+        await db.portfolios.bulk_write([
+            UpdateOne(_unrecorded(user_id, rows_by_user[user_id]), _record(rows_by_user[user_id]))
+            for user_id in existing
+        ], ordered=False)
+    missing = [user_id for user_id in rows_by_user if user_id not in existing]
+    if missing:
+        created = await _insert_portfolios(db, await _build_portfolios(db, missing))
+        await asyncio.gather(*(
+            record_investments(db, user_id, rows_by_user[user_id])
+            for user_id in missing if user_id not in created
+        ))
+
+
+async def apply_status_change(db, investment: dict, old_status: str, new_status: str):
+    """Move an investment between statuses in its owner's portfolio."""
+    if old_status == new_status:
+        return
+    amount = investment["amount"]
+    fund_id = investment["fund_id"]
+    increments = {
+        f"status_counts.{old_status}": -1,
+        f"status_counts.{new_status}": 1,
+        f"status_amounts.{old_status}": -amount,
+        f"status_amounts.{new_status}": amount,
+        "version": 1,
+    }
+    committed_delta = 0
+    if old_status == CANCELLED:
+        committed_delta = amount
+    elif new_status == CANCELLED:
+        committed_delta = -amount
+    if committed_delta:
+        increments["total_committed"] = committed_delta
+        increments[f"funds.{fund_id}.committed"] = committed_delta
+    # Matching the old status too skips a row a concurrent rebuild already moved
+    result = await db.portfolios.update_one(
+        {
+            "user_id": investment["user_id"],
+            "investments": {"$elemMatch": {"id": investment["id"], "status": old_status}},
+        },
+        {
+            "$inc": increments,
+            "$set": {"investments.$.status": new_status, "updated_at": datetime.utcnow()},
+        },
+    )
+    if result.matched_count == 0:
+        # No portfolio yet, which the next read builds, or one out of step with this row
+        await _reconcile_batch(db, [investment["user_id"]])
+
+
+async def _reconcile_batch(db, user_ids: List[str]) -> int:
+    versions = {
+        doc["user_id"]: doc.get("version")
+        async for doc in db.portfolios.find(
+            {"user_id": {"$in": user_ids}}, {"_id": 0, "user_id": 1, "version": 1}
+        )
+    }
+    if not versions:
+        return 0
+    portfolios = await _build_portfolios(db, list(versions))
+    # Replaced only if no write landed since the versions were read; a write that did
+    # land leaves that user for the next reconcile instead of being overwritten
+    result = await db.portfolios.bulk_write([
+        ReplaceOne(
+            {"user_id": user_id, "version": version},
+            {**portfolios[user_id], "version": (version or 0) + 1},
+        )
+        for user_id, version in versions.items()
+    ], ordered=False)
+    return result.matched_count
+
+
+async def reconcile_portfolios(db, batch_size: int = 100) -> int:
+    """Rebuild every materialized portfolio from the investments collection, in batches."""
+    reconciled = 0
+    batch = []
+    async for portfolio in db.portfolios.find({}, {"_id": 0, "user_id": 1}).batch_size(batch_size):
+        batch.append(portfolio["user_id"])
+        if len(batch) >= batch_size:
+            reconciled += await _reconcile_batch(db, batch)
+            batch = []
+    if batch:
+        reconciled += await _reconcile_batch(db, batch)
+    logger.info(f"Reconciled {reconciled} portfolios")
+    return reconciled
+
+
+def summary_view(portfolio: dict) -> dict:
+    """Portfolio totals without the per-investment rows."""
+    view = {
+        key: value for key, value in portfolio.items() if key not in ("investments", "version")
+    }
+    view["funds"] = list(portfolio.get("funds", {}).values())
+    return view
@@ -0,0 +1,146 @@
+import logging
+import math
+import os
+import time
+from collections import OrderedDict
+from typing import Dict, NamedTuple, Optional, Tuple
+
+from cache import redis_from_url
+from metrics import RATE_LIMIT_DECISIONS
+
+
+logger = logging.getLogger(__name__)
+
+# Atomically refill and take one token; returns {allowed, seconds until a token is free}
+_TOKEN_BUCKET_LUA = """
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local now = tonumber(ARGV[3])
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'updated')
+local tokens = tonumber(bucket[1]) or capacity
+local updated = tonumber(bucket[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - updated) * rate)
+local allowed = 0
+local retry_after = 0
+if tokens >= 1 then
+  tokens = tokens - 1
+  allowed = 1
+else
+  retry_after = (1 - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'updated', now)
+redis.call('EXPIRE', KEYS[1], math.ceil(capacity / rate) + 1)
+return {allowed, tostring(retry_after)}
+"""
+
+
+class Limit(NamedTuple):
+    capacity: int
+    period: float
+
+    @property
+    def rate(self) -> float:
+        return self.capacity / self.period
+
+    @classmethod
+    def parse(cls, value: str) -> "Limit":
+        """Parse "<requests>/<seconds>", e.g. "20/60" for 20 per minute with a burst of 20."""
+        capacity, period = value.split("/")
+        return cls(int(capacity), float(period))
+
+
+class MemoryBackend:
+    """Token buckets held in this process; bounded so spoofed keys can't grow it forever."""
+
+    def __init__(self, maxsize: int = 100_000):
+        self.maxsize = maxsize
+        self._buckets: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()
+
+    async def take(self, key: str, limit: Limit) -> Tuple[bool, float]:
+        now = time.monotonic()
+        tokens, updated = self._buckets.get(key, (limit.capacity, now))
+        tokens = min(limit.capacity, tokens + (now - updated) * limit.rate)
+        allowed = tokens >= 1
+        retry_after = 0.0
+        if allowed:
+            tokens -= 1
+        else:
+            retry_after = (1 - tokens) / limit.rate
+        self._buckets[key] = (tokens, now)
+        self._buckets.move_to_end(key)
+        while len(self._buckets) > self.maxsize:
+            self._buckets.popitem(last=False)
+        return allowed, retry_after
+
+
+class RedisBackend:
+    """Token buckets shared by every worker and instance through redis."""
+
+    def __init__(self, redis, prefix: str = "ratelimit:"):
+        self.prefix = prefix
+        self._redis = redis
+        self._script = self._redis.register_script(_TOKEN_BUCKET_LUA)
+
+    async def take(self, key: str, limit: Limit) -> Tuple[bool, float]:
+        allowed, retry_after = await self._script(
+            keys=[self.prefix + key], args=[limit.capacity, limit.rate, time.time()]
+        )
+        return bool(allowed), float(retry_after)
+
+    async def close(self):
+        await self._redis.aclose()
+
+
+class RateLimiter:
+    """Per-key token bucket limits for named actions such as "login"."""
+
+    def __init__(self, limits: Dict[Tuple[str, str], Limit], backend=None, enabled: bool = True):
+        self.limits = limits
+        self.backend = backend or MemoryBackend()
+        self.enabled = enabled
+        # Used when redis is unreachable, so an outage degrades to per-worker limits
+        self._fallback = MemoryBackend()
+
+    @classmethod
+    def from_env(cls):
+        redis_url = os.environ.get("RATE_LIMIT_REDIS_URL")
+        return cls(
+            limits={
+                ("login", "ip"): Limit.parse(os.environ.get("RATE_LIMIT_LOGIN_PER_IP", "20/60")),
+                ("login", "email"): Limit.parse(os.environ.get("RATE_LIMIT_LOGIN_PER_EMAIL", "5/60")),
+                ("register", "ip"): Limit.parse(os.environ.get("RATE_LIMIT_REGISTER_PER_IP", "10/3600")),
+                ("register", "email"): Limit.parse(os.environ.get("RATE_LIMIT_REGISTER_PER_EMAIL", "3/3600")),
+            },
+            backend=RedisBackend(redis_from_url(redis_url)) if redis_url else MemoryBackend(),
+            enabled=os.environ.get("RATE_LIMIT_ENABLED", "true").lower() == "true",
+        )
+
+    async def _take(self, key: str, limit: Limit) -> Tuple[bool, float]:
+        try:
+            return await self.backend.take(key, limit)
+        except Exception as e:
+            logger.warning(f"Rate limit backend unavailable, limiting in-process: {e}")
+            return await self._fallback.take(key, limit)
+
+    async def hit(self, action: str, **keys: Optional[str]) -> Optional[int]:
+        """Take a token from each of the action's buckets, e.g. hit("login", ip=..., email=...).
+
+        Returns None when allowed, or the whole seconds to wait before retrying.
+        """
+        if not self.enabled:
+            return None
+        for key_type, value in keys.items():
+            limit = self.limits.get((action, key_type))
+            if limit is None or not value:
+                continue
+            allowed, retry_after = await self._take(f"{action}:{key_type}:{value}", limit)
+            RATE_LIMIT_DECISIONS.labels(
+                action=action, key_type=key_type, result="allowed" if allowed else "limited"
+            ).inc()
+            if not allowed:
+                return max(1, math.ceil(retry_after))
+        return None
+
+    async def close(self):
+        if isinstance(self.backend, RedisBackend):
+            await self.backend.close()
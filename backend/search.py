@@ -0,0 +1,270 @@
+import asyncio
+import bisect
+import heapq
+import logging
+import re
+import unicodedata
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, NamedTuple, Optional, Sequence, Tuple
+
+
+logger = logging.getLogger(__name__)
+
+# Per collection: the field shown as the result name, and the searchable fields with their weights
+SEARCH_FIELDS: Dict[str, Tuple[str, Dict[str, float]]] = {
+    "funds": ("name", {"symbol": 4.0, "name": 3.0, "gp_name": 1.0}),
+    "companies": ("name", {"symbol": 4.0, "name": 3.0, "lead_investor": 1.0, "co_investors": 1.0}),
+    "deals": ("company_name", {"symbol": 4.0, "company_name": 3.0, "syndicate": 1.0,
+                               "co_investors": 1.0}),
+}
+
+REFRESH_OVERLAP = timedelta(seconds=60)
+
+# Single-term lookups on prefixes this common read a ranking kept sorted on every write
+RANKED_POSTING_MIN = 500
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+EntryKey = Tuple[str, str]
+
+
+def tokenize(text: str) -> List[str]:
+    # Fold accents so "Société" matches "societe"
+    folded = unicodedata.normalize("NFKD", text).encode("ascii", "ignore").decode()
+    return _TOKEN_RE.findall(folded.lower())
+
+
+def _field_values(doc: dict, field: str) -> Iterable[str]:
+    value = doc.get(field)
+    if isinstance(value, str):
+        return [value]
+    if isinstance(value, list):
+        return [item for item in value if isinstance(item, str)]
+    return []
+
+
+class SearchEntry(NamedTuple):
+    kind: str
+    id: str
+    name: str
+    symbol: str
+    tokens: frozenset
+
+
+class SearchIndex:
+    """In-memory prefix index over fund, company and deal names for typeahead.
+
+    Every prefix of every token maps to the entries containing it, weighted by
+    the field it came from, so a lookup is a few dict reads and a top-k merge.
+    """
+
+    def __init__(self, max_prefix: int = 16):
+        self.max_prefix = max_prefix
+        self.loaded = False
+        self._entries: Dict[EntryKey, SearchEntry] = {}
+        self._postings: Dict[str, Dict[EntryKey, float]] = {}
+        # Ascending (-score, name length, key), so the best matches come first
+        self._ranked: Dict[str, List[Tuple[float, int, EntryKey]]] = {}
+        self._watermarks: Dict[str, datetime] = {}
+        self._refresh_requested = asyncio.Event()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def add(self, kind: str, doc: dict):
+        key = (kind, doc["id"])
+        if key in self._entries:
+            self.remove(kind, doc["id"])
+        name_field, fields = SEARCH_FIELDS[kind]
+        weights: Dict[str, float] = {}
+        tokens = set()
+        for field, weight in fields.items():
+            for value in _field_values(doc, field):
+                for token in tokenize(value):
+                    tokens.add(token)
+                    for length in range(1, min(len(token), self.max_prefix) + 1):
+                        prefix = token[:length]
+                        # A whole-word match outranks the same text as a prefix
+                        score = weight if length == len(token) else weight / 2
+                        weights[prefix] = max(weights.get(prefix, 0), score)
+        name = doc.get(name_field) or ""
+        for prefix, score in weights.items():
+            self._postings.setdefault(prefix, {})[key] = score
+            ranked = self._ranked.get(prefix)
+            if ranked is not None:
+                bisect.insort(ranked, (-score, len(name), key))
+        self._entries[key] = SearchEntry(
+            kind, doc["id"], name, doc.get("symbol") or "", frozenset(tokens)
+        )
+        updated_at = doc.get("updated_at")
+        if isinstance(updated_at, datetime):
+            self._watermarks[kind] = max(updated_at, self._watermarks.get(kind, updated_at))
+
+    def remove(self, kind: str, doc_id: str):
+        entry = self._entries.pop((kind, doc_id), None)
+        if entry is None:
+            return
+        for token in entry.tokens:
+            for length in range(1, min(len(token), self.max_prefix) + 1):
+                prefix = token[:length]
+                posting = self._postings.get(prefix)
+                if posting is None or (kind, doc_id) not in posting:
+                    continue
+                score = posting.pop((kind, doc_id))
+                ranked = self._ranked.get(prefix)
+                if ranked is not None:
+                    item = (-score, len(entry.name), (kind, doc_id))
+                    index = bisect.bisect_left(ranked, item)
+                    if index < len(ranked) and ranked[index] == item:
+                        del ranked[index]
+                if not posting:
+                    del self._postings[prefix]
+                    self._ranked.pop(prefix, None)
+
+    def search(self, query: str, limit: int = 10,
+               kinds: Optional[Sequence[str]] = None) -> List[dict]:
+        """Entries matching every query token as a word prefix, best first."""
+        terms = tokenize(query)
+        if not terms:
+            return []
+        postings = []
+        for term in terms:
+            posting = self._postings.get(term[:self.max_prefix])
+            if not posting:
+                return []
+            postings.append(posting)
+        long_terms = [term for term in terms if len(term) > self.max_prefix]
+        if len(terms) == 1 and not long_terms and len(postings[0]) >= RANKED_POSTING_MIN:
+            return self._format(self._top_ranked(terms[0], kinds, limit))
+
+        # Walk the rarest term's entries and look the rest up
+        postings.sort(key=len)
+        scored = []
+        for key, score in postings[0].items():
+            if kinds and key[0] not in kinds:
+                continue
+            for posting in postings[1:]:
+                other = posting.get(key)
+                if other is None:
+                    break
+                score += other
+            else:
+                entry = self._entries[key]
+                if long_terms and not all(
+                    any(token.startswith(term) for token in entry.tokens) for term in long_terms
+                ):
+                    continue
+                # Prefer higher scores, then shorter names
+                scored.append((score, -len(entry.name), key))
+        return self._format(heapq.nlargest(limit, scored))
+
+    def _ranking(self, prefix: str) -> List[Tuple[float, int, EntryKey]]:
+        ranked = self._ranked.get(prefix)
+        if ranked is None:
+            ranked = sorted(
+                (-score, len(self._entries[key].name), key)
+                for key, score in self._postings[prefix].items()
+            )
+            self._ranked[prefix] = ranked
+        return ranked
+
+    def _top_ranked(self, prefix: str, kinds: Optional[Sequence[str]], limit: int):
+        top = []
+        for negative_score, name_length, key in self._ranking(prefix):
+            if kinds and key[0] not in kinds:
+                continue
+            top.append((-negative_score, -name_length, key))
+            if len(top) >= limit:
+                break
+        return top
+
+    def _format(self, scored) -> List[dict]:
+        return [
+            {
+                "kind": key[0],
+                "id": key[1],
+                "name": self._entries[key].name,
+                "symbol": self._entries[key].symbol,
+                "score": score,
+            }
+            for score, _, key in scored
+        ]
+
+    @staticmethod
+    def _projection(kind: str) -> dict:
+        name_field, fields = SEARCH_FIELDS[kind]
+        projection = {field: 1 for field in fields}
+        projection.update({"_id": 0, "id": 1, name_field: 1, "updated_at": 1})
+        return projection
+
+    async def load(self, db, batch_size: int = 1000):
+        for kind in SEARCH_FIELDS:
+            async for doc in db[kind].find({}, self._projection(kind)).batch_size(batch_size):
+                self.add(kind, doc)
+        # Rank the most common prefixes up front so the first keystrokes are fast too
+        for prefix, posting in self._postings.items():
+            if len(posting) >= RANKED_POSTING_MIN:
+                self._ranking(prefix)
+        self.loaded = True
+        logger.info(f"Loaded {len(self)} documents into the search index")
+
+    async def refresh(self, db):
+        """Pick up documents written since the last load, e.g. by other workers."""
+        for kind in SEARCH_FIELDS:
+            watermark = self._watermarks.get(kind)
+            # Overlap the window so writes from lagging replicas or skewed clocks aren't skipped
+            query = {"updated_at": {"$gte": watermark - REFRESH_OVERLAP}} if watermark else {}
+            async for doc in db[kind].find(query, self._projection(kind)):
+                self.add(kind, doc)
+
+    def request_refresh(self):
+        self._refresh_requested.set()
+
+    async def keep_fresh(self, db, interval: float):
+        """Load the index, then refresh it on request or every interval seconds."""
+        while not self.loaded:
+            try:
+                await self.load(db)
+            except Exception as e:
+                logger.warning(f"Search index load failed, serving text search meanwhile: {e}")
+                await asyncio.sleep(interval)
+        while True:
+            # asyncio.wait rather than wait_for, which can swallow a cancellation that
+            # lands just as the event fires
+            requested = asyncio.ensure_future(self._refresh_requested.wait())
+            try:
+                await asyncio.wait([requested], timeout=interval)
+            finally:
+                requested.cancel()
+            self._refresh_requested.clear()
+            try:
+                await self.refresh(db)
+            except Exception as e:
+                logger.warning(f"Search index refresh failed: {e}")
+
+
+async def text_search(db, query: str, limit: int = 10,
+                      kinds: Optional[Sequence[str]] = None) -> List[dict]:
+    """Ranked search through the MongoDB text indexes, for when the memory index isn't loaded."""
+    kinds = [kind for kind in SEARCH_FIELDS if not kinds or kind in kinds]
+
+    async def search_kind(kind: str) -> List[dict]:
+        name_field, _ = SEARCH_FIELDS[kind]
+        cursor = db[kind].find(
+            {"$text": {"$search": query}},
+            {"_id": 0, "id": 1, name_field: 1, "symbol": 1, "score": {"$meta": "textScore"}},
+        ).sort([("score", {"$meta": "textScore"})]).limit(limit)
+        return [
+            {
+                "kind": kind,
+                "id": doc["id"],
+                "name": doc.get(name_field) or "",
+                "symbol": doc.get("symbol") or "",
+                "score": doc["score"],
+            }
+            async for doc in cursor
+        ]
+
+    results = await asyncio.gather(*(search_kind(kind) for kind in kinds))
+    return heapq.nlargest(limit, (result for batch in results for result in batch),
+                          key=lambda result: result["score"])
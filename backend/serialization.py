@@ -0,0 +1,56 @@
+from decimal import Decimal
+from functools import lru_cache
+from typing import Any, Dict, Iterable, List, Type
+
+import orjson
+from bson import ObjectId
+from pydantic import BaseModel
+from starlette.responses import JSONResponse
+
+
+def _default(value: Any) -> Any:
+    # orjson already handles datetimes, enums, dicts and lists natively
+    if isinstance(value, ObjectId):
+        return str(value)
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, BaseModel):
+        return value.model_dump()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def dumps(content: Any) -> bytes:
+    return orjson.dumps(content, default=_default, option=orjson.OPT_NON_STR_KEYS)
+
+
+class FastJSONResponse(JSONResponse):
+    """JSON response for content that is already response-ready, skipping jsonable_encoder."""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+@lru_cache(maxsize=None)
+def _static_defaults(model: Type[BaseModel]) -> Dict[str, Any]:
+    return {
+        name: field.default
+        for name, field in model.model_fields.items()
+        if not field.is_required() and field.default_factory is None
+    }
+
+
+@lru_cache(maxsize=None)
+def model_projection(model: Type[BaseModel]) -> Dict[str, int]:
+    """Project a MongoDB query onto exactly the model's fields."""
+    projection = {name: 1 for name in model.model_fields}
+    projection["_id"] = 0
+    return projection
+
+
+def trusted_documents(model: Type[BaseModel], docs: Iterable[dict]) -> List[dict]:
+    """Documents we wrote ourselves, shaped like the model without re-validating them.
+
+    Expects docs read with model_projection(), so only missing defaults need filling in.
+    """
+    defaults = _static_defaults(model)
+    return [{**defaults, **doc} for doc in docs]
@@ -1,32 +1,80 @@
-from fastapi import FastAPI, APIRouter, HTTPException, Depends, status
+from fastapi import FastAPI, APIRouter, HTTPException, Depends, Query, Request, Response, status
+from fastapi.responses import JSONResponse, ORJSONResponse, StreamingResponse
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
-from motor.motor_asyncio import AsyncIOMotorClient
 import os
 import logging
 from pathlib import Path
+from pymongo.errors import BulkWriteError
 from pydantic import BaseModel, Field, EmailStr
 from typing import List, Optional, Dict, Any, Union
 import uuid
 from datetime import datetime, timedelta
 from enum import Enum
 import jwt
-from passlib.context import CryptContext
+import asyncio
 import re
+import signal
 from email_validator import validate_email, EmailNotValidError
 
+from cache import InvalidationBus, LRUCache, PayloadCache, TieredCache, redis_from_url
+from change_feed import ChangeFeed
+from crud import create_document, write_concern_from_env
+from database import create_client, read_database
+from deal_expiry import DealExpiryScheduler, backfill_deal_status, utc_naive
+from export import iter_ndjson
+from fund_stats import (
+    apply_fund_status_change,
+    get_fund_stats,
+    reconcile_fund_stats,
+    record_fund_investments,
+)
+from http_caching import cache_headers, document_etag, not_modified_response
+from indexes import ensure_indexes, index_usage_report
+from loaders import Includes, Loaders, embed_related, parse_includes
+from metrics import PrometheusMiddleware, render_metrics, track_duration
+from migrations import Migration, run_migrations
+from numeric_fields import add_range_filter, backfill_numeric_fields, numeric_fields_for
+from pagination import build_projection, fetch_page
+from search import SearchIndex, text_search
+from serialization import FastJSONResponse, dumps, model_projection, trusted_documents
+from portfolios import (
+    apply_status_change,
+    get_portfolio,
+    investment_row,
+    reconcile_portfolios,
+    record_investments,
+    record_investments_many,
+    summary_view,
+)
+from password_hashing import PasswordHasher
+from rate_limit import RateLimiter
+
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
-# MongoDB connection
+# MongoDB connection, opened in each worker process after it has been forked
 mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
-db = client[os.environ.get('DB_NAME', 'limited_app')]
+client = None
+db = None
+# Same database with the replica read preference, for reads that tolerate lag
+read_db = None
+
+# Flipped on once every startup hook has run, and off again while shutting down
+is_ready = False
 
 # Create the main app without a prefix
-app = FastAPI()
+app = FastAPI(default_response_class=ORJSONResponse)
+
+
+@app.on_event("startup")
+async def connect_to_mongo():
+    global client, db, read_db
+    client = create_client(mongo_url)
+    db = client[os.environ.get('DB_NAME', 'limited_app')]
+    read_db = read_database(client, db.name)
 
 # Create a router with the /api prefix
 api_router = APIRouter(prefix="/api")
@@ -36,11 +84,133 @@ SECRET_KEY = os.environ.get("JWT_SECRET_KEY", "default_secret_key_for_developmen
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 60 * 24 * 7  # 1 week
 
-# Password hashing
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Opt-in: trust the status/user_type claims signed into short-lived tokens instead of
+# re-reading the user on every request. A suspension then takes effect on token expiry.
+AUTH_TRUST_TOKEN_CLAIMS = os.environ.get("AUTH_TRUST_TOKEN_CLAIMS", "false").lower() == "true"
+CLAIMS_TOKEN_EXPIRE_MINUTES = int(os.environ.get("CLAIMS_TOKEN_EXPIRE_MINUTES", 15))
+
+# Authenticated user principals, keyed by user id
+user_cache = LRUCache(
+    maxsize=int(os.environ.get("USER_CACHE_MAX_SIZE", 10000)),
+    ttl=float(os.environ.get("USER_CACHE_TTL_SECONDS", 30)),
+    name="user_principal",
+)
+
+# Password hashing runs on a worker pool so bcrypt never blocks the event loop
+password_hasher = PasswordHasher.from_env()
+
+# Throttles the bcrypt-bound auth endpoints per client IP and per email
+rate_limiter = RateLimiter.from_env()
+
+# Homepage payload, rebuilt only after a fund/company/deal is created
+featured_cache = PayloadCache(
+    serializer=dumps,
+    ttl=float(os.environ.get("FEATURED_CACHE_TTL_SECONDS", 60)),
+    name="featured",
+)
+
+# Invalidations reach every worker over redis pub/sub; in-process only without CACHE_REDIS_URL
+cache_bus = InvalidationBus(redis_from_url(os.environ.get("CACHE_REDIS_URL")))
+cache_bus.register(
+    "user_principal", lambda key: user_cache.clear() if key is None else user_cache.invalidate(key)
+)
+cache_bus.register("featured", lambda key: featured_cache.invalidate())
+
+# Typeahead index over fund, company and deal names; other workers pick up
+# new documents when a create broadcasts "search"
+search_index = SearchIndex()
+cache_bus.register("search", lambda key: search_index.request_refresh())
+
+# Read-through fund/company/deal lookups, shared through redis when it is configured
+document_caches = {
+    collection: TieredCache(
+        collection, cache_bus,
+        maxsize=int(os.environ.get("DOCUMENT_CACHE_MAX_SIZE", 10000)),
+        ttl=float(os.environ.get("DOCUMENT_CACHE_TTL_SECONDS", 60)),
+    )
+    for collection in ("funds", "companies", "deals")
+}
+
+# List endpoint page sizes
+PAGE_SIZE_DEFAULT = int(os.environ.get("PAGE_SIZE_DEFAULT", 100))
+PAGE_SIZE_MAX = int(os.environ.get("PAGE_SIZE_MAX", 1000))
+
+# Export batch sizes
+EXPORT_BATCH_SIZE_DEFAULT = int(os.environ.get("EXPORT_BATCH_SIZE_DEFAULT", 500))
+EXPORT_BATCH_SIZE_MAX = int(os.environ.get("EXPORT_BATCH_SIZE_MAX", 5000))
+
+# Largest batch accepted by the bulk investment endpoint
+INVESTMENT_BATCH_MAX_SIZE = int(os.environ.get("INVESTMENT_BATCH_MAX_SIZE", 1000))
+
+# Most ids accepted by one multi-get request
+MULTI_GET_MAX_IDS = int(os.environ.get("MULTI_GET_MAX_IDS", 100))
+
+# Write settings for fund/company/deal creation
+WRITE_CONCERN = write_concern_from_env()
+CREATE_RETURN_DOCUMENT = os.environ.get("CREATE_RETURN_DOCUMENT", "false").lower() == "true"
+
+# Sort keys accepted by list endpoints, mapped to the indexed field they sort on
+FUND_SORT_FIELDS = {
+    "created_at": "created_at",
+    "carry": "carry_high_bps",
+    "management_fee": "management_fee_bps",
+}
+VALUATION_SORT_FIELDS = {
+    "created_at": "created_at",
+    "valuation": "valuation_cents",
+}
+# Parsed shadow fields, null on documents whose string couldn't be parsed
+NUMERIC_SORT_FIELDS = {"carry_high_bps", "management_fee_bps", "valuation_cents"}
+
+# Open deals close when their deadline passes; every worker also rescans this often
+# to pick up deals created elsewhere
+DEAL_EXPIRY_ENABLED = os.environ.get("DEAL_EXPIRY_ENABLED", "true").lower() == "true"
+DEAL_EXPIRY_RESYNC_SECONDS = float(os.environ.get("DEAL_EXPIRY_RESYNC_SECONDS", 300))
+
+
+async def on_deals_closed(deal_ids: List[str]):
+    for deal_id in deal_ids:
+        await document_caches["deals"].invalidate(deal_id)
+    await cache_bus.invalidate("featured")
+
+
+deal_expiry = DealExpiryScheduler(on_deals_closed, resync_interval=DEAL_EXPIRY_RESYNC_SECONDS)
+
+# Periodic fund stats reconciliation, disabled when 0
+FUND_STATS_RECONCILE_INTERVAL_SECONDS = float(os.environ.get("FUND_STATS_RECONCILE_INTERVAL_SECONDS", 0))
+FUND_STATS_RECONCILE_BATCH_SIZE = int(os.environ.get("FUND_STATS_RECONCILE_BATCH_SIZE", 100))
+
+# Periodic rebuild of materialized portfolios from investments, disabled when 0
+PORTFOLIO_RECONCILE_INTERVAL_SECONDS = float(os.environ.get("PORTFOLIO_RECONCILE_INTERVAL_SECONDS", 0))
+PORTFOLIO_RECONCILE_BATCH_SIZE = int(os.environ.get("PORTFOLIO_RECONCILE_BATCH_SIZE", 100))
+
+# Shared caches (nginx, browsers) may reuse the public homepage payload this long
+FEATURED_MAX_AGE_SECONDS = int(os.environ.get("FEATURED_MAX_AGE_SECONDS", 30))
+
+# Typeahead search; without the in-memory index it falls back to MongoDB text indexes
+SEARCH_INDEX_ENABLED = os.environ.get("SEARCH_INDEX_ENABLED", "true").lower() == "true"
+SEARCH_REFRESH_INTERVAL_SECONDS = float(os.environ.get("SEARCH_REFRESH_INTERVAL_SECONDS", 30))
+SEARCH_LIMIT_MAX = int(os.environ.get("SEARCH_LIMIT_MAX", 50))
+
+# Live updates over server-sent events; needs MongoDB change streams (a replica set).
+# Reconnecting clients resume from the last STREAM_BUFFER_SIZE events, and a client
+# more than STREAM_CLIENT_QUEUE_SIZE events behind is told to reset
+STREAM_ENABLED = os.environ.get("STREAM_ENABLED", "true").lower() == "true"
+STREAM_BUFFER_SIZE = int(os.environ.get("STREAM_BUFFER_SIZE", 1000))
+STREAM_CLIENT_QUEUE_SIZE = int(os.environ.get("STREAM_CLIENT_QUEUE_SIZE", 100))
+STREAM_HEARTBEAT_SECONDS = float(os.environ.get("STREAM_HEARTBEAT_SECONDS", 15))
+# Lifetime of the single-purpose tickets that authenticate a stream from its URL
+STREAM_TICKET_TTL_SECONDS = int(os.environ.get("STREAM_TICKET_TTL_SECONDS", 30))
+
+# Schema migrations and seeding: "background" keeps them off the readiness path,
+# "blocking" waits for them, and "off" leaves them to a separate deploy step
+MIGRATIONS_MODE = os.environ.get("MIGRATIONS_MODE", "background")
+if MIGRATIONS_MODE not in ("background", "blocking", "off"):
+    raise ValueError(f"Unsupported MIGRATIONS_MODE: {MIGRATIONS_MODE}")
 
 # OAuth2 token URL
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/auth/token")
+optional_oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/auth/token", auto_error=False)
 
 
 class FundType(str, Enum):
@@ -86,6 +256,19 @@ class UserStatus(str, Enum):
     SUSPENDED = "Suspended"
 
 
+class InvestmentStatus(str, Enum):
+    PENDING = "Pending"
+    COMPLETED = "Completed"
+    CANCELLED = "Cancelled"
+
+
+class ExportCollection(str, Enum):
+    FUNDS = "funds"
+    COMPANIES = "companies"
+    DEALS = "deals"
+    INVESTMENTS = "investments"
+
+
 # Auth models
 class TokenData(BaseModel):
     user_id: str
@@ -147,10 +330,29 @@ class Fund(BaseModel):
     gp_name: str
     target_close_date: Optional[datetime] = None
     performance: Optional[str] = None
+    # Parsed from carry/management_fee for range queries
+    carry_low_bps: Optional[int] = None
+    carry_high_bps: Optional[int] = None
+    management_fee_bps: Optional[int] = None
+    management_fee_years: Optional[int] = None
     created_at: datetime = Field(default_factory=datetime.utcnow)
     updated_at: datetime = Field(default_factory=datetime.utcnow)
 
 
+class FundStats(BaseModel):
+    fund_id: str
+    total_committed: int = 0  # Excludes cancelled investments
+    investment_count: int = 0
+    investor_count: int = 0
+    status_counts: Dict[str, int] = {}
+    status_amounts: Dict[str, int] = {}
+    updated_at: Optional[datetime] = None
+
+
+class FundWithStats(Fund):
+    stats: FundStats
+
+
 class Company(BaseModel):
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
     name: str
@@ -161,10 +363,16 @@ class Company(BaseModel):
     valuation: str
     round: Round
     traction: str
+    valuation_cents: Optional[int] = None  # Parsed from valuation for range queries
     created_at: datetime = Field(default_factory=datetime.utcnow)
     updated_at: datetime = Field(default_factory=datetime.utcnow)
 
 
+class DealStatus(str, Enum):
+    OPEN = "Open"
+    CLOSED = "Closed"
+
+
 class Deal(BaseModel):
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
     company_id: str
@@ -177,10 +385,28 @@ class Deal(BaseModel):
     co_investors: Optional[List[str]] = None
     invited_date: datetime
     deadline: datetime
+    status: DealStatus = DealStatus.OPEN
+    valuation_cents: Optional[int] = None  # Parsed from valuation for range queries
     created_at: datetime = Field(default_factory=datetime.utcnow)
     updated_at: datetime = Field(default_factory=datetime.utcnow)
 
 
+# Multi-get responses: items follow the requested ids, with null where one wasn't found
+class FundBatch(BaseModel):
+    items: List[Optional[Fund]]
+    missing: List[str]
+
+
+class CompanyBatch(BaseModel):
+    items: List[Optional[Company]]
+    missing: List[str]
+
+
+class DealBatch(BaseModel):
+    items: List[Optional[Deal]]
+    missing: List[str]
+
+
 class FundCreate(BaseModel):
     name: str
     symbol: str
@@ -244,13 +470,28 @@ class InvestmentCreate(BaseModel):
     amount: int
 
 
+class InvestmentStatusUpdate(BaseModel):
+    status: InvestmentStatus
+
+
+class InvestmentBatchItem(InvestmentCreate):
+    user_id: Optional[str] = None  # Fund managers and admins may record commitments for an LP
+
+
+class InvestmentBatchResult(BaseModel):
+    index: int
+    success: bool
+    investment: Optional[Investment] = None
+    error: Optional[str] = None
+
+
 # Security functions
-def verify_password(plain_password, hashed_password):
-    return pwd_context.verify(plain_password, hashed_password)
+async def verify_password(plain_password, hashed_password):
+    return await password_hasher.verify(plain_password, hashed_password)
 
 
-def get_password_hash(password):
-    return pwd_context.hash(password)
+async def get_password_hash(password):
+    return await password_hasher.hash(password)
 
 
 async def get_user_by_email(email: str):
@@ -264,7 +505,7 @@ async def authenticate_user(email: str, password: str):
     user = await get_user_by_email(email)
     if not user:
         return False
-    if not verify_password(password, user.hashed_password):
+    if not await verify_password(password, user.hashed_password):
         return False
     return user
 
@@ -280,7 +521,39 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     return encoded_jwt
 
 
+def principal_claims(user: User) -> dict:
+    return {
+        "status": user.status,
+        "first_name": user.first_name,
+        "last_name": user.last_name,
+        "company_name": user.company_name,
+        "is_accredited": user.is_accredited,
+        "created_at": user.created_at.isoformat(),
+        "updated_at": user.updated_at.isoformat(),
+    }
+
+
+def user_from_claims(payload: dict) -> User:
+    return User(
+        id=payload["sub"],
+        email=payload["email"],
+        user_type=payload["user_type"],
+        status=payload["status"],
+        first_name=payload["first_name"],
+        last_name=payload["last_name"],
+        company_name=payload.get("company_name"),
+        is_accredited=payload.get("is_accredited", False),
+        created_at=payload["created_at"],
+        updated_at=payload["updated_at"],
+    )
+
+
 async def get_current_user(token: str = Depends(oauth2_scheme)):
+    with track_duration("get_current_user"):
+        return await _resolve_current_user(token)
+
+
+async def _resolve_current_user(token: str, scope: Optional[str] = None):
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -293,13 +566,23 @@ async def get_current_user(token: str = Depends(oauth2_scheme)):
         user_type: str = payload.get("user_type")
         if user_id is None or email is None:
             raise credentials_exception
+        # A scoped token, e.g. a stream ticket, is only good for what it was issued for
+        if payload.get("scope") != scope:
+            raise credentials_exception
         token_data = TokenData(user_id=user_id, email=email, user_type=UserType(user_type))
     except jwt.PyJWTError:
         raise credentials_exception
+    if AUTH_TRUST_TOKEN_CLAIMS and "status" in payload:
+        return user_from_claims(payload)
+    cached_user = user_cache.get(user_id)
+    if cached_user is not None:
+        return cached_user
     user = await db.users.find_one({"id": user_id})
     if user is None:
         raise credentials_exception
-    return User(**user)
+    current_user = User(**user)
+    user_cache.set(user_id, current_user)
+    return current_user
 
 
 async def get_current_active_user(current_user: User = Depends(get_current_user)):
@@ -309,8 +592,21 @@ async def get_current_active_user(current_user: User = Depends(get_current_user)
 
 
 # Authentication Routes
+async def enforce_rate_limit(action: str, request: Request, email: str):
+    # nginx sets X-Forwarded-For and uvicorn's proxy headers turn it into request.client
+    ip = request.client.host if request.client else None
+    retry_after = await rate_limiter.hit(action, ip=ip, email=email.strip().lower())
+    if retry_after is not None:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Too many attempts, please try again later",
+            headers={"Retry-After": str(retry_after)},
+        )
+
+
 @api_router.post("/auth/register", response_model=User)
-async def register_user(user: UserCreate):
+async def register_user(user: UserCreate, request: Request):
+    await enforce_rate_limit("register", request, user.email)
     # Check if email is valid
     try:
         valid = validate_email(user.email)
@@ -328,7 +624,7 @@ async def register_user(user: UserCreate):
         raise HTTPException(status_code=400, detail="Password must be at least 8 characters")
     
     # Create new user
-    hashed_password = get_password_hash(user.password)
+    hashed_password = await get_password_hash(user.password)
     user_data = user.dict()
     user_data.pop("password")
     user_data["email"] = email.lower()
@@ -344,7 +640,8 @@ async def register_user(user: UserCreate):
 
 
 @api_router.post("/auth/token", response_model=Token)
-async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends()):
+async def login_for_access_token(request: Request, form_data: OAuth2PasswordRequestForm = Depends()):
+    await enforce_rate_limit("login", request, form_data.username)
     user = await authenticate_user(form_data.username, form_data.password)
     if not user:
         raise HTTPException(
@@ -359,7 +656,13 @@ async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(
         "user_type": user.user_type
     }
     
-    access_token = create_access_token(token_data)
+    if AUTH_TRUST_TOKEN_CLAIMS:
+        token_data.update(principal_claims(user))
+        access_token = create_access_token(
+            token_data, expires_delta=timedelta(minutes=CLAIMS_TOKEN_EXPIRE_MINUTES)
+        )
+    else:
+        access_token = create_access_token(token_data)
     
     return {
         "access_token": access_token,
@@ -385,15 +688,111 @@ async def update_user(update_data: UserUpdate, current_user: User = Depends(get_
         user_data["updated_at"] = datetime.utcnow()
         await db.users.update_one({"id": current_user.id}, {"$set": user_data})
     
-    updated_user = await db.users.find_one({"id": current_user.id})
-    return User(**updated_user)
+    updated_user = User(**await db.users.find_one({"id": current_user.id}))
+    await cache_bus.invalidate("user_principal", current_user.id)
+    user_cache.set(current_user.id, updated_user)
+    return updated_user
+
+
+async def get_cached_document(collection: str, doc_id: str) -> Optional[dict]:
+    return await document_caches[collection].get_or_load(
+        doc_id, lambda: db[collection].find_one({"id": doc_id}, {"_id": 0})
+    )
+
+
+# Related documents the include= parameter can embed: name -> (collection, foreign key)
+DEAL_INCLUDES: Includes = {"company": ("companies", "company_id")}
+INVESTMENT_INCLUDES: Includes = {"fund": ("funds", "fund_id")}
+
+
+def get_loaders() -> Loaders:
+    """Batching id lookups shared by everything resolving one request"""
+    return Loaders(read_db, {"funds": Fund, "companies": Company, "users": User})
+
+
+def requested_includes(include: Optional[str], allowed: Includes) -> Includes:
+    try:
+        return parse_includes(include, allowed)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+def include_keys(*fields: str, includes: Optional[Includes] = None) -> List[str]:
+    """Fields a projection needs, plus the foreign keys the includes are resolved from"""
+    return list(fields) + [foreign_key for _, foreign_key in (includes or {}).values()]
+
+
+async def list_page(collection, model, query: dict, cursor: Optional[str], limit: int,
+                    fields: Optional[str], sort: str = "-created_at",
+                    sort_fields: Optional[dict] = None, includes: Optional[Includes] = None,
+                    loaders: Optional[Loaders] = None):
+    sort_fields = sort_fields or {"created_at": "created_at"}
+    sort_field = sort_fields.get(sort.lstrip("-"))
+    if sort_field is None:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Invalid sort, expected one of: {', '.join(sort_fields)}"
+        )
+    if sort_field in NUMERIC_SORT_FIELDS:
+        # Documents whose value couldn't be parsed have nothing to sort or page on
+        query.setdefault(sort_field, {})["$type"] = "number"
+    try:
+        projection = build_projection(
+            fields, model.model_fields, required=include_keys("id", "created_at", includes=includes)
+        )
+        docs, next_cursor = await fetch_page(
+            collection, query, limit=limit, cursor=cursor,
+            projection=projection or model_projection(model),
+            sort_field=sort_field, descending=sort.startswith("-")
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    headers = {"X-Next-Cursor": next_cursor} if next_cursor else {}
+    if projection is None:
+        # Our own writes were validated on the way in; only fill in missing defaults
+        docs = trusted_documents(model, docs)
+    if includes:
+        await embed_related(loaders, docs, includes)
+    return FastJSONResponse(content=docs, headers=headers)
+
+
+async def get_many(collection, model, ids: str, fields: Optional[str],
+                   includes: Optional[Includes] = None, loaders: Optional[Loaders] = None):
+    """Documents for comma separated ids in one query, in request order with misses as null"""
+    requested = [doc_id.strip() for doc_id in ids.split(",") if doc_id.strip()]
+    if not requested:
+        raise HTTPException(status_code=400, detail="No ids given")
+    if len(requested) > MULTI_GET_MAX_IDS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {MULTI_GET_MAX_IDS} ids can be fetched at once"
+        )
+    try:
+        projection = build_projection(
+            fields, model.model_fields, required=include_keys("id", includes=includes)
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    unique_ids = list(dict.fromkeys(requested))
+    docs = await collection.find(
+        {"id": {"$in": unique_ids}}, projection or model_projection(model)
+    ).to_list(len(unique_ids))
+    if projection is None:
+        docs = trusted_documents(model, docs)
+    if includes:
+        await embed_related(loaders, docs, includes)
+    by_id = {doc["id"]: doc for doc in docs}
+    return FastJSONResponse(content={
+        "items": [by_id.get(doc_id) for doc_id in requested],
+        "missing": [doc_id for doc_id in unique_ids if doc_id not in by_id],
+    })
 
 
 # Investment Routes
 @api_router.post("/investments", response_model=Investment)
 async def create_investment(investment: InvestmentCreate, current_user: User = Depends(get_current_active_user)):
     # Check if fund exists
-    fund = await db.funds.find_one({"id": investment.fund_id})
+    fund = await get_cached_document("funds", investment.fund_id)
     if not fund:
         raise HTTPException(status_code=404, detail="Fund not found")
     
@@ -416,37 +815,150 @@ async def create_investment(investment: InvestmentCreate, current_user: User = D
     }
     
     await db.investments.insert_one(investment_data)
+    await asyncio.gather(
+        record_investments(db, current_user.id, [investment_row(investment_data, fund)]),
+        record_fund_investments(db, [investment_data]),
+    )
     
     return Investment(**investment_data)
 
 
+@api_router.post("/investments/batch", response_model=List[InvestmentBatchResult])
+async def create_investments_batch(
+    investments: List[InvestmentBatchItem],
+    current_user: User = Depends(get_current_active_user)
+):
+    """Record many commitments with one fund lookup and one write"""
+    if len(investments) > INVESTMENT_BATCH_MAX_SIZE:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {INVESTMENT_BATCH_MAX_SIZE} investments per batch"
+        )
+    can_record_for_others = current_user.user_type in (UserType.FUND_MANAGER, UserType.ADMIN)
+    
+    # Resolve every referenced fund and investor in one query each
+    fund_ids = list({item.fund_id for item in investments})
+    funds = await db.funds.find(
+        {"id": {"$in": fund_ids}},
+        {"_id": 0, "id": 1, "name": 1, "symbol": 1, "min_investment": 1, "carry": 1}
+    ).to_list(len(fund_ids))
+    funds = {fund["id"]: fund for fund in funds}
+    user_ids = list({item.user_id for item in investments if item.user_id} - {current_user.id})
+    known_users = set()
+    if user_ids and can_record_for_others:
+        users = await db.users.find({"id": {"$in": user_ids}}, {"_id": 0, "id": 1}).to_list(len(user_ids))
+        known_users = {user["id"] for user in users}
+    
+    results = []
+    to_insert = []
+    for index, item in enumerate(investments):
+        user_id = item.user_id or current_user.id
+        fund = funds.get(item.fund_id)
+        error = None
+        if user_id != current_user.id and not can_record_for_others:
+            error = "Only fund managers can record investments for other users"
+        elif user_id != current_user.id and user_id not in known_users:
+            error = "User not found"
+        elif not fund:
+            error = "Fund not found"
+        elif item.amount < fund["min_investment"]:
+            error = f"Investment amount must be at least {fund['min_investment']}"
+        if error:
+            results.append(InvestmentBatchResult(index=index, success=False, error=error))
+            continue
+        now = datetime.utcnow()
+        investment_data = {
+            "id": str(uuid.uuid4()),
+            "user_id": user_id,
+            "fund_id": item.fund_id,
+            "amount": item.amount,
+            "created_at": now,
+            "updated_at": now,
+            "status": "Pending"
+        }
+        results.append(InvestmentBatchResult(index=index, success=True))
+        to_insert.append((index, investment_data))
+    
+    if to_insert:
+        failed_writes = {}
+        try:
+            await db.investments.insert_many([data for _, data in to_insert], ordered=False)
+        except BulkWriteError as e:
+            failed_writes = {error["index"]: error["errmsg"] for error in e.details.get("writeErrors", [])}
+        rows_by_user = {}
+        for position, (index, investment_data) in enumerate(to_insert):
+            if position in failed_writes:
+                results[index] = InvestmentBatchResult(
+                    index=index, success=False, error=failed_writes[position]
+                )
+            else:
+                investment_data.pop("_id", None)
+                results[index].investment = Investment(**investment_data)
+                rows_by_user.setdefault(investment_data["user_id"], []).append(
+                    investment_row(investment_data, funds[investment_data["fund_id"]])
+                )
+        await asyncio.gather(
+            record_investments_many(db, rows_by_user),
+            record_fund_investments(
+                db, [result.investment.dict() for result in results if result.investment]
+            ),
+        )
+    
+    return results
+
+
 @api_router.get("/investments", response_model=List[dict])
-async def get_user_investments(current_user: User = Depends(get_current_active_user)):
-    # Get user's investments with fund details
-    pipeline = [
-        {"$match": {"user_id": current_user.id}},
-        {"$lookup": {
-            "from": "funds",
-            "localField": "fund_id",
-            "foreignField": "id",
-            "as": "fund"
-        }},
-        {"$unwind": "$fund"},
-        {"$project": {
-            "id": 1,
-            "amount": 1,
-            "status": 1,
-            "created_at": 1,
-            "fund_id": 1,
-            "fund_name": "$fund.name",
-            "fund_symbol": "$fund.symbol",
-            "min_investment": "$fund.min_investment",
-            "carry": "$fund.carry"
-        }}
-    ]
+async def get_user_investments(
+    include: Optional[str] = Query(None, description="fund"),
+    loaders: Loaders = Depends(get_loaders),
+    current_user: User = Depends(get_current_active_user)
+):
+    # Investments with fund details come from the user's materialized portfolio
+    includes = requested_includes(include, INVESTMENT_INCLUDES)
+    portfolio = await get_portfolio(db, current_user.id)
+    if includes:
+        await embed_related(loaders, portfolio["investments"], includes)
+    return FastJSONResponse(content=portfolio["investments"])
+
+
+@api_router.get("/investments/summary")
+async def get_investment_summary(current_user: User = Depends(get_current_active_user)):
+    """Committed totals per fund and counts by status for the current user"""
+    portfolio = await get_portfolio(db, current_user.id, exclude=("investments",))
+    return FastJSONResponse(content=summary_view(portfolio))
+
+
+@api_router.put("/investments/{investment_id}/status", response_model=Investment)
+async def update_investment_status(
+    investment_id: str,
+    update: InvestmentStatusUpdate,
+    current_user: User = Depends(get_current_active_user)
+):
+    investment = await db.investments.find_one({"id": investment_id}, {"_id": 0})
+    if not investment:
+        raise HTTPException(status_code=404, detail="Investment not found")
+    is_manager = current_user.user_type in (UserType.FUND_MANAGER, UserType.ADMIN)
+    is_owner_cancelling = (
+        investment["user_id"] == current_user.id and update.status == InvestmentStatus.CANCELLED
+    )
+    if not is_manager and not is_owner_cancelling:
+        raise HTTPException(status_code=403, detail="Only fund managers can change investment status")
+    
+    # Only the request that actually flips the status applies it to the aggregates
+    previous = await db.investments.find_one_and_update(
+        {"id": investment_id, "status": investment["status"]},
+        {"$set": {"status": update.status.value, "updated_at": datetime.utcnow()}},
+        projection={"_id": 0},
+    )
+    if previous is None:
+        raise HTTPException(status_code=409, detail="Investment was modified concurrently, retry")
+    await asyncio.gather(
+        apply_status_change(db, previous, previous["status"], update.status.value),
+        apply_fund_status_change(db, previous, previous["status"], update.status.value),
+    )
     
-    investments = await db.investments.aggregate(pipeline).to_list(1000)
-    return investments
+    previous.update(status=update.status.value, updated_at=datetime.utcnow())
+    return Investment(**previous)
 
 
 # Fund Routes
@@ -455,25 +967,102 @@ async def create_fund(fund: FundCreate, current_user: User = Depends(get_current
     if current_user.user_type != UserType.FUND_MANAGER and current_user.user_type != UserType.ADMIN:
         raise HTTPException(status_code=403, detail="Only fund managers can create funds")
     
-    fund_dict = fund.dict()
-    fund_obj = Fund(**fund_dict)
-    result = await db.funds.insert_one(fund_obj.dict())
-    created_fund = await db.funds.find_one({"_id": result.inserted_id})
-    return Fund(**created_fund)
+    fund_data = fund.dict()
+    fund_data.update(numeric_fields_for("funds", fund_data))
+    created_fund = await create_document(
+        db.funds, Fund, fund_data,
+        write_concern=WRITE_CONCERN, return_document=CREATE_RETURN_DOCUMENT
+    )
+    search_index.add("funds", created_fund.dict())
+    await cache_bus.invalidate("featured")
+    await cache_bus.invalidate("search")
+    return created_fund
 
 
 @api_router.get("/funds", response_model=List[Fund])
-async def get_funds(current_user: User = Depends(get_current_active_user)):
-    funds = await db.funds.find().to_list(1000)
-    return [Fund(**fund) for fund in funds]
+async def get_funds(
+    fund_type: Optional[FundType] = None,
+    fund_status: Optional[str] = Query(None, alias="status"),
+    min_carry: Optional[float] = Query(None, ge=0, description="Percent"),
+    max_carry: Optional[float] = Query(None, ge=0, description="Percent"),
+    max_management_fee: Optional[float] = Query(None, ge=0, description="Percent"),
+    sort: str = "-created_at",
+    cursor: Optional[str] = None,
+    limit: int = Query(PAGE_SIZE_DEFAULT, ge=1, le=PAGE_SIZE_MAX),
+    fields: Optional[str] = None,
+    current_user: User = Depends(get_current_active_user)
+):
+    query = {}
+    if fund_type:
+        query["fund_type"] = fund_type
+    if fund_status:
+        query["status"] = fund_status
+    if min_carry is not None:
+        add_range_filter(query, "carry_low_bps", minimum=round(min_carry * 100))
+    if max_carry is not None:
+        add_range_filter(query, "carry_high_bps", maximum=round(max_carry * 100))
+    if max_management_fee is not None:
+        add_range_filter(query, "management_fee_bps", maximum=round(max_management_fee * 100))
+    return await list_page(
+        read_db.funds, Fund, query, cursor, limit, fields, sort, FUND_SORT_FIELDS
+    )
 
 
-@api_router.get("/funds/{fund_id}", response_model=Fund)
-async def get_fund(fund_id: str, current_user: User = Depends(get_current_active_user)):
-    fund = await db.funds.find_one({"id": fund_id})
+@api_router.get("/funds/batch", response_model=FundBatch)
+async def get_funds_by_ids(
+    ids: str = Query(..., description="Comma separated fund ids"),
+    fields: Optional[str] = None,
+    current_user: User = Depends(get_current_active_user)
+):
+    return await get_many(read_db.funds, Fund, ids, fields)
+
+
+def can_view_fund_stats(user: User) -> bool:
+    return user.user_type == UserType.FUND_MANAGER or user.user_type == UserType.ADMIN
+
+
+@api_router.get("/funds/{fund_id}", response_model=Union[FundWithStats, Fund])
+async def get_fund(
+    fund_id: str,
+    request: Request,
+    response: Response,
+    current_user: User = Depends(get_current_active_user)
+):
+    """The fund, with its commitment stats for those allowed to see /funds/{fund_id}/stats"""
+    if not can_view_fund_stats(current_user):
+        fund = await get_cached_document("funds", fund_id)
+        if not fund:
+            raise HTTPException(status_code=404, detail="Fund not found")
+        etag = document_etag(fund_id, fund.get("updated_at"))
+        not_modified = not_modified_response(request, etag)
+        if not_modified:
+            return not_modified
+        response.headers.update(cache_headers(etag))
+        return Fund(**fund)
+
+    fund, stats = await asyncio.gather(
+        get_cached_document("funds", fund_id),
+        get_fund_stats(db, fund_id),
+    )
     if not fund:
         raise HTTPException(status_code=404, detail="Fund not found")
-    return Fund(**fund)
+    # A different representation from the one without stats, so the ETags must differ too
+    etag = document_etag(fund_id, fund.get("updated_at"), "stats", stats.get("updated_at"))
+    not_modified = not_modified_response(request, etag)
+    if not_modified:
+        return not_modified
+    response.headers.update(cache_headers(etag))
+    return FundWithStats(**fund, stats=FundStats(**stats))
+
+
+@api_router.get("/funds/{fund_id}/stats", response_model=FundStats)
+async def get_fund_commitment_stats(fund_id: str, current_user: User = Depends(get_current_active_user)):
+    """Committed totals, status breakdown and investor count for a fund"""
+    if not can_view_fund_stats(current_user):
+        raise HTTPException(status_code=403, detail="Only fund managers can view fund stats")
+    if not await get_cached_document("funds", fund_id):
+        raise HTTPException(status_code=404, detail="Fund not found")
+    return FundStats(**await get_fund_stats(db, fund_id))
 
 
 # Company Routes
@@ -482,24 +1071,69 @@ async def create_company(company: CompanyCreate, current_user: User = Depends(ge
     if current_user.user_type != UserType.FUND_MANAGER and current_user.user_type != UserType.ADMIN:
         raise HTTPException(status_code=403, detail="Only fund managers can create companies")
     
-    company_dict = company.dict()
-    company_obj = Company(**company_dict)
-    result = await db.companies.insert_one(company_obj.dict())
-    created_company = await db.companies.find_one({"_id": result.inserted_id})
-    return Company(**created_company)
+    company_data = company.dict()
+    company_data.update(numeric_fields_for("companies", company_data))
+    created_company = await create_document(
+        db.companies, Company, company_data,
+        write_concern=WRITE_CONCERN, return_document=CREATE_RETURN_DOCUMENT
+    )
+    search_index.add("companies", created_company.dict())
+    await cache_bus.invalidate("featured")
+    await cache_bus.invalidate("search")
+    return created_company
 
 
 @api_router.get("/companies", response_model=List[Company])
-async def get_companies(current_user: User = Depends(get_current_active_user)):
-    companies = await db.companies.find().to_list(1000)
-    return [Company(**company) for company in companies]
+async def get_companies(
+    sector: Optional[Sector] = None,
+    round: Optional[Round] = None,
+    min_valuation: Optional[int] = Query(None, ge=0, description="US dollars"),
+    max_valuation: Optional[int] = Query(None, ge=0, description="US dollars"),
+    sort: str = "-created_at",
+    cursor: Optional[str] = None,
+    limit: int = Query(PAGE_SIZE_DEFAULT, ge=1, le=PAGE_SIZE_MAX),
+    fields: Optional[str] = None,
+    current_user: User = Depends(get_current_active_user)
+):
+    query = {}
+    if sector:
+        query["sector"] = sector
+    if round:
+        query["round"] = round
+    add_range_filter(
+        query, "valuation_cents",
+        minimum=min_valuation * 100 if min_valuation is not None else None,
+        maximum=max_valuation * 100 if max_valuation is not None else None,
+    )
+    return await list_page(
+        read_db.companies, Company, query, cursor, limit, fields, sort, VALUATION_SORT_FIELDS
+    )
+
+
+@api_router.get("/companies/batch", response_model=CompanyBatch)
+async def get_companies_by_ids(
+    ids: str = Query(..., description="Comma separated company ids"),
+    fields: Optional[str] = None,
+    current_user: User = Depends(get_current_active_user)
+):
+    return await get_many(read_db.companies, Company, ids, fields)
 
 
 @api_router.get("/companies/{company_id}", response_model=Company)
-async def get_company(company_id: str, current_user: User = Depends(get_current_active_user)):
-    company = await db.companies.find_one({"id": company_id})
+async def get_company(
+    company_id: str,
+    request: Request,
+    response: Response,
+    current_user: User = Depends(get_current_active_user)
+):
+    company = await get_cached_document("companies", company_id)
     if not company:
         raise HTTPException(status_code=404, detail="Company not found")
+    etag = document_etag(company_id, company.get("updated_at"))
+    not_modified = not_modified_response(request, etag)
+    if not_modified:
+        return not_modified
+    response.headers.update(cache_headers(etag))
     return Company(**company)
 
 
@@ -509,33 +1143,265 @@ async def create_deal(deal: DealCreate, current_user: User = Depends(get_current
     if current_user.user_type != UserType.FUND_MANAGER and current_user.user_type != UserType.ADMIN:
         raise HTTPException(status_code=403, detail="Only fund managers can create deals")
     
-    deal_dict = deal.dict()
-    deal_obj = Deal(**deal_dict)
-    result = await db.deals.insert_one(deal_obj.dict())
-    created_deal = await db.deals.find_one({"_id": result.inserted_id})
-    return Deal(**created_deal)
+    deal_data = deal.dict()
+    deal_data.update(numeric_fields_for("deals", deal_data))
+    deal_data["deadline"] = utc_naive(deal.deadline)
+    if deal_data["deadline"] <= datetime.utcnow():
+        deal_data["status"] = DealStatus.CLOSED
+    created_deal = await create_document(
+        db.deals, Deal, deal_data,
+        write_concern=WRITE_CONCERN, return_document=CREATE_RETURN_DOCUMENT
+    )
+    if created_deal.status == DealStatus.OPEN:
+        deal_expiry.schedule(created_deal.id, created_deal.deadline)
+    search_index.add("deals", created_deal.dict())
+    await cache_bus.invalidate("featured")
+    await cache_bus.invalidate("search")
+    return created_deal
 
 
 @api_router.get("/deals", response_model=List[Deal])
-async def get_deals(current_user: User = Depends(get_current_active_user)):
-    deals = await db.deals.find().to_list(1000)
-    return [Deal(**deal) for deal in deals]
+async def get_deals(
+    sector: Optional[Sector] = None,
+    round: Optional[Round] = None,
+    deal_status: Optional[DealStatus] = Query(None, alias="status"),
+    min_valuation: Optional[int] = Query(None, ge=0, description="US dollars"),
+    max_valuation: Optional[int] = Query(None, ge=0, description="US dollars"),
+    sort: str = "-created_at",
+    cursor: Optional[str] = None,
+    limit: int = Query(PAGE_SIZE_DEFAULT, ge=1, le=PAGE_SIZE_MAX),
+    fields: Optional[str] = None,
+    include: Optional[str] = Query(None, description="company"),
+    loaders: Loaders = Depends(get_loaders),
+    current_user: User = Depends(get_current_active_user)
+):
+    query = {}
+    if sector:
+        query["sector"] = sector
+    if round:
+        query["round"] = round
+    if deal_status:
+        query["status"] = deal_status
+    add_range_filter(
+        query, "valuation_cents",
+        minimum=min_valuation * 100 if min_valuation is not None else None,
+        maximum=max_valuation * 100 if max_valuation is not None else None,
+    )
+    return await list_page(
+        read_db.deals, Deal, query, cursor, limit, fields, sort, VALUATION_SORT_FIELDS,
+        includes=requested_includes(include, DEAL_INCLUDES), loaders=loaders
+    )
+
+
+@api_router.get("/deals/open", response_model=List[Deal])
+async def get_open_deals(
+    sector: Optional[Sector] = None,
+    round: Optional[Round] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(PAGE_SIZE_DEFAULT, ge=1, le=PAGE_SIZE_MAX),
+    fields: Optional[str] = None,
+    include: Optional[str] = Query(None, description="company"),
+    loaders: Loaders = Depends(get_loaders),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Live deals, closing soonest first"""
+    # The deadline bound also hides deals the expiry scheduler hasn't closed yet
+    query = {"status": DealStatus.OPEN, "deadline": {"$gt": datetime.utcnow()}}
+    if sector:
+        query["sector"] = sector
+    if round:
+        query["round"] = round
+    return await list_page(
+        read_db.deals, Deal, query, cursor, limit, fields, "deadline", {"deadline": "deadline"},
+        includes=requested_includes(include, DEAL_INCLUDES), loaders=loaders
+    )
+
+
+@api_router.get("/deals/batch", response_model=DealBatch)
+async def get_deals_by_ids(
+    ids: str = Query(..., description="Comma separated deal ids"),
+    fields: Optional[str] = None,
+    include: Optional[str] = Query(None, description="company"),
+    loaders: Loaders = Depends(get_loaders),
+    current_user: User = Depends(get_current_active_user)
+):
+    return await get_many(
+        read_db.deals, Deal, ids, fields,
+        includes=requested_includes(include, DEAL_INCLUDES), loaders=loaders
+    )
 
 
 @api_router.get("/deals/{deal_id}", response_model=Deal)
-async def get_deal(deal_id: str, current_user: User = Depends(get_current_active_user)):
-    deal = await db.deals.find_one({"id": deal_id})
+async def get_deal(
+    deal_id: str,
+    request: Request,
+    response: Response,
+    include: Optional[str] = Query(None, description="company"),
+    loaders: Loaders = Depends(get_loaders),
+    current_user: User = Depends(get_current_active_user)
+):
+    includes = requested_includes(include, DEAL_INCLUDES)
+    deal = await get_cached_document("deals", deal_id)
     if not deal:
         raise HTTPException(status_code=404, detail="Deal not found")
-    return Deal(**deal)
+    if not includes:
+        etag = document_etag(deal_id, deal.get("updated_at"))
+        not_modified = not_modified_response(request, etag)
+        if not_modified:
+            return not_modified
+        response.headers.update(cache_headers(etag))
+        return Deal(**deal)
+    content = Deal(**deal).model_dump()
+    await embed_related(loaders, [content], includes)
+    # Versioned by the embedded documents too, so an edited company changes the ETag
+    etag = document_etag(
+        deal_id, deal.get("updated_at"),
+        *((content[name] or {}).get("updated_at") for name in includes)
+    )
+    not_modified = not_modified_response(request, etag)
+    if not_modified:
+        return not_modified
+    return FastJSONResponse(content=content, headers=cache_headers(etag))
+
+
+# Search Routes
+class SearchKind(str, Enum):
+    FUNDS = "funds"
+    COMPANIES = "companies"
+    DEALS = "deals"
+
+
+class SearchResult(BaseModel):
+    kind: SearchKind
+    id: str
+    name: str
+    symbol: str
+    score: float
+
+
+@api_router.get("/search", response_model=List[SearchResult])
+async def search(
+    q: str = Query(..., min_length=1, max_length=100),
+    kinds: Optional[List[SearchKind]] = Query(None, alias="kind"),
+    limit: int = Query(10, ge=1, le=SEARCH_LIMIT_MAX),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Typeahead over fund, company and deal names, symbols and investors"""
+    kinds = [kind.value for kind in kinds] if kinds else None
+    if SEARCH_INDEX_ENABLED and search_index.loaded:
+        return search_index.search(q, limit=limit, kinds=kinds)
+    return await text_search(read_db, q, limit=limit, kinds=kinds)
+
+
+# Live Update Routes
+class StreamTopic(str, Enum):
+    FUNDS = "funds"
+    COMPANIES = "companies"
+    DEALS = "deals"
+    INVESTMENTS = "investments"
+
+
+change_feed = ChangeFeed(
+    fields={
+        "funds": Fund.model_fields,
+        "companies": Company.model_fields,
+        "deals": Deal.model_fields,
+        "investments": Investment.model_fields,
+    },
+    buffer_size=STREAM_BUFFER_SIZE,
+    max_queue=STREAM_CLIENT_QUEUE_SIZE,
+    heartbeat_interval=STREAM_HEARTBEAT_SECONDS,
+)
+
+
+class StreamTicket(BaseModel):
+    ticket: str
+    expires_in: int
+
+
+async def get_stream_user(
+    bearer_token: Optional[str] = Depends(optional_oauth2_scheme),
+    ticket: Optional[str] = Query(None)
+):
+    # Browsers' EventSource can't set headers, so it passes a ticket in the URL instead.
+    # URLs end up in access logs, hence a short-lived ticket rather than the access token
+    if bearer_token:
+        current_user = await _resolve_current_user(bearer_token)
+    else:
+        current_user = await _resolve_current_user(ticket or "", scope="stream")
+    return await get_current_active_user(current_user)
+
+
+@api_router.post("/stream/ticket", response_model=StreamTicket)
+async def create_stream_ticket(current_user: User = Depends(get_current_active_user)):
+    """A short-lived credential for opening /stream, which is all it can be used for"""
+    ticket = create_access_token(
+        data={
+            "sub": current_user.id,
+            "email": current_user.email,
+            "user_type": current_user.user_type,
+            "scope": "stream",
+        },
+        expires_delta=timedelta(seconds=STREAM_TICKET_TTL_SECONDS),
+    )
+    return StreamTicket(ticket=ticket, expires_in=STREAM_TICKET_TTL_SECONDS)
+
+
+@api_router.get("/stream")
+async def stream_updates(
+    request: Request,
+    topics: Optional[List[StreamTopic]] = Query(None, alias="topic"),
+    current_user: User = Depends(get_stream_user)
+):
+    """Server-sent events for fund, company and deal writes and the caller's own investments"""
+    if not STREAM_ENABLED or not change_feed.available:
+        raise HTTPException(status_code=503, detail="Live updates are unavailable")
+    topics = [topic.value for topic in topics] if topics else [topic.value for topic in StreamTopic]
+    return StreamingResponse(
+        change_feed.stream(current_user.id, topics, request.headers.get("last-event-id")),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+# Export Routes
+@api_router.get("/export/{collection}")
+async def export_collection(
+    collection: ExportCollection,
+    batch_size: int = Query(EXPORT_BATCH_SIZE_DEFAULT, ge=1, le=EXPORT_BATCH_SIZE_MAX),
+    gzip: bool = False,
+    current_user: User = Depends(get_current_active_user)
+):
+    """Stream a whole collection as NDJSON for back-office reporting"""
+    if collection == ExportCollection.INVESTMENTS:
+        if current_user.user_type != UserType.ADMIN:
+            raise HTTPException(status_code=403, detail="Only admins can export investments")
+    elif current_user.user_type != UserType.FUND_MANAGER and current_user.user_type != UserType.ADMIN:
+        raise HTTPException(status_code=403, detail="Only fund managers can export data")
+    
+    headers = {"Content-Disposition": f'attachment; filename="{collection.value}.ndjson"'}
+    if gzip:
+        headers["Content-Encoding"] = "gzip"
+    return StreamingResponse(
+        iter_ndjson(read_db[collection.value], {}, batch_size=batch_size, compress=gzip),
+        media_type="application/x-ndjson",
+        headers=headers,
+    )
 
 
 # Featured Items API
-@api_router.get("/featured")
-async def get_featured_items():
-    """Get featured funds and deals for the homepage"""
+async def build_featured_payload():
+    # Featured funds are the first few of the same funds query. Read from the primary:
+    # rebuilds follow the writes that invalidate the cache, and a lagging secondary's
+    # payload would be cached under the new version
+    with track_duration("build_featured_payload"):
+        funds, companies, deals = await asyncio.gather(
+            db.funds.find().to_list(50),
+            db.companies.find().to_list(50),
+            db.deals.find().to_list(50),
+        )
+    
     # Featured Funds
-    featured_funds = await db.funds.find().limit(3).to_list(3)
     featured_funds = [
         {
             "id": fund["id"],
@@ -548,11 +1414,10 @@ async def get_featured_items():
             "performance": fund.get("performance"),
             "fund_type": fund.get("fund_type")
         }
-        for fund in featured_funds
+        for fund in funds[:3]
     ]
     
     # All Funds
-    all_funds = await db.funds.find().to_list(50)
     all_funds = [
         {
             "id": fund["id"],
@@ -565,11 +1430,10 @@ async def get_featured_items():
             "status": fund.get("status", "Active"),
             "fund_type": fund.get("fund_type")
         }
-        for fund in all_funds
+        for fund in funds
     ]
     
     # All Companies
-    all_companies = await db.companies.find().to_list(50)
     all_companies = [
         {
             "id": company["id"],
@@ -582,11 +1446,10 @@ async def get_featured_items():
             "round": company["round"],
             "traction": company["traction"]
         }
-        for company in all_companies
+        for company in companies
     ]
     
     # All Deals
-    all_deals = await db.deals.find().to_list(50)
     all_deals = [
         {
             "id": deal["id"],
@@ -600,7 +1463,7 @@ async def get_featured_items():
             "invited_date": deal["invited_date"],
             "deadline": deal["deadline"]
         }
-        for deal in all_deals
+        for deal in deals
     ]
     
     return {
@@ -611,15 +1474,29 @@ async def get_featured_items():
     }
 
 
+@api_router.get("/featured")
+async def get_featured_items(request: Request):
+    """Get featured funds and deals for the homepage"""
+    featured = await featured_cache.get_or_build(build_featured_payload)
+    cache_control = f"public, max-age={FEATURED_MAX_AGE_SECONDS}"
+    not_modified = not_modified_response(request, featured.etag, cache_control)
+    if not_modified:
+        return not_modified
+    headers = cache_headers(featured.etag, cache_control)
+    headers["X-Featured-Version"] = str(featured.version)
+    return Response(content=featured.body, media_type="application/json", headers=headers)
+
+
 # Protected Featured API (for authenticated users only)
 @api_router.get("/featured/protected")
 async def get_protected_featured_items(current_user: User = Depends(get_current_active_user)):
     """Get featured funds and deals for authenticated users"""
     # Get the regular featured data
-    featured_data = await get_featured_items()
+    featured = await featured_cache.get_or_build(build_featured_payload)
+    featured_data = dict(featured.payload)
     
     # Add user's investments if they exist
-    user_investments = await db.investments.find({"user_id": current_user.id}).to_list(100)
+    portfolio = await get_portfolio(db, current_user.id)
     user_investments = [
         {
             "id": investment["id"],
@@ -628,7 +1505,7 @@ async def get_protected_featured_items(current_user: User = Depends(get_current_
             "status": investment["status"],
             "created_at": investment["created_at"]
         }
-        for investment in user_investments
+        for investment in portfolio["investments"][:100]
     ]
     
     featured_data["user_investments"] = user_investments
@@ -636,16 +1513,47 @@ async def get_protected_featured_items(current_user: User = Depends(get_current_
     return featured_data
 
 
-# Seed initial data if none exists
+# Admin Routes
+@api_router.get("/admin/indexes")
+async def get_index_report(current_user: User = Depends(get_current_active_user)):
+    """Report missing and unused MongoDB indexes"""
+    if current_user.user_type != UserType.ADMIN:
+        raise HTTPException(status_code=403, detail="Only admins can view index reports")
+    return await index_usage_report(db)
+
+
+@api_router.post("/admin/fund-stats/reconcile")
+async def reconcile_fund_stats_now(current_user: User = Depends(get_current_active_user)):
+    """Recompute fund commitment stats from investments to correct drift"""
+    if current_user.user_type != UserType.ADMIN:
+        raise HTTPException(status_code=403, detail="Only admins can reconcile fund stats")
+    reconciled = await reconcile_fund_stats(db, batch_size=FUND_STATS_RECONCILE_BATCH_SIZE)
+    return {"reconciled_funds": reconciled}
+
+
+@api_router.post("/admin/portfolios/reconcile")
+async def reconcile_portfolios_now(current_user: User = Depends(get_current_active_user)):
+    """Rebuild materialized portfolios from investments to correct drift"""
+    if current_user.user_type != UserType.ADMIN:
+        raise HTTPException(status_code=403, detail="Only admins can reconcile portfolios")
+    reconciled = await reconcile_portfolios(db, batch_size=PORTFOLIO_RECONCILE_BATCH_SIZE)
+    return {"reconciled_portfolios": reconciled}
+
+
+# Make sure every lookup key is indexed before serving traffic
 @app.on_event("startup")
-async def seed_initial_data():
-    # Check if we already have data
-    fund_count = await db.funds.count_documents({})
-    company_count = await db.companies.count_documents({})
-    deal_count = await db.deals.count_documents({})
-    user_count = await db.users.count_documents({})
-    
-    if fund_count == 0:
+async def ensure_db_indexes():
+    await ensure_indexes(db)
+
+
+async def is_empty(collection) -> bool:
+    # An existence check stays cheap however large the collection grows
+    return await collection.find_one({}, {"_id": 1}) is None
+
+
+# Seed initial data if none exists
+async def seed_initial_data(db):
+    if await is_empty(db.funds):
         # Seed Demo Day Funds
         demo_day_funds = [
             {
@@ -723,7 +1631,7 @@ async def seed_initial_data():
         ]
         await db.funds.insert_many(demo_day_funds)
     
-    if company_count == 0:
+    if await is_empty(db.companies):
         # Seed Companies
         companies = [
             {
@@ -794,7 +1702,7 @@ async def seed_initial_data():
         ]
         await db.companies.insert_many(companies)
     
-    if deal_count == 0:
+    if await is_empty(db.deals):
         # Seed Deals
         deals = [
             {
@@ -875,7 +1783,13 @@ async def seed_initial_data():
         ]
         await db.deals.insert_many(deals)
     
-    if user_count == 0:
+    if await is_empty(db.users):
+        admin_password, manager_password, investor_password = await asyncio.gather(
+            get_password_hash("admin123"),
+            get_password_hash("manager123"),
+            get_password_hash("investor123"),
+        )
+        
         # Create a test admin user
         admin_user = {
             "id": str(uuid.uuid4()),
@@ -886,7 +1800,7 @@ async def seed_initial_data():
             "user_type": UserType.ADMIN,
             "is_accredited": True,
             "status": UserStatus.VERIFIED,
-            "hashed_password": get_password_hash("admin123"),
+            "hashed_password": admin_password,
             "created_at": datetime.utcnow(),
             "updated_at": datetime.utcnow()
         }
@@ -901,7 +1815,7 @@ async def seed_initial_data():
             "user_type": UserType.FUND_MANAGER,
             "is_accredited": True,
             "status": UserStatus.VERIFIED,
-            "hashed_password": get_password_hash("manager123"),
+            "hashed_password": manager_password,
             "created_at": datetime.utcnow(),
             "updated_at": datetime.utcnow()
         }
@@ -916,7 +1830,7 @@ async def seed_initial_data():
             "user_type": UserType.LP,
             "is_accredited": True,
             "status": UserStatus.VERIFIED,
-            "hashed_password": get_password_hash("investor123"),
+            "hashed_password": investor_password,
             "created_at": datetime.utcnow(),
             "updated_at": datetime.utcnow()
         }
@@ -924,21 +1838,146 @@ async def seed_initial_data():
         await db.users.insert_many([admin_user, fund_manager, lp_user])
 
 
+# Background jobs started at startup and cancelled on shutdown
+background_tasks: List[asyncio.Task] = []
+
+
+# Applied once per database, in order; recorded in schema_migrations
+MIGRATIONS = [
+    Migration("0001_seed_initial_data", "Seed demo funds, companies, deals and users",
+              seed_initial_data),
+    Migration("0002_backfill_numeric_fields", "Populate numeric shadow fields",
+              backfill_numeric_fields),
+    Migration("0003_reconcile_fund_stats", "Build commitment stats for existing funds",
+              lambda db: reconcile_fund_stats(db, batch_size=FUND_STATS_RECONCILE_BATCH_SIZE)),
+    Migration("0004_backfill_deal_status", "Open or close existing deals by deadline",
+              backfill_deal_status),
+]
+
+
+async def run_migrations_in_background():
+    try:
+        await run_migrations(db, MIGRATIONS)
+    except Exception as e:
+        logger.error(f"Migrations failed: {e}")
+
+
+@app.on_event("startup")
+async def apply_migrations():
+    if MIGRATIONS_MODE == "blocking":
+        await run_migrations(db, MIGRATIONS)
+    elif MIGRATIONS_MODE == "background":
+        background_tasks.append(asyncio.create_task(run_migrations_in_background()))
+
+
+async def reconcile_periodically(name: str, reconcile, interval: float, batch_size: int):
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await reconcile(db, batch_size=batch_size)
+        except Exception as e:
+            logger.error(f"{name} reconciliation failed: {e}")
+
+
+@app.on_event("startup")
+async def start_background_jobs():
+    if FUND_STATS_RECONCILE_INTERVAL_SECONDS > 0:
+        background_tasks.append(asyncio.create_task(reconcile_periodically(
+            "Fund stats", reconcile_fund_stats,
+            FUND_STATS_RECONCILE_INTERVAL_SECONDS, FUND_STATS_RECONCILE_BATCH_SIZE
+        )))
+    if PORTFOLIO_RECONCILE_INTERVAL_SECONDS > 0:
+        background_tasks.append(asyncio.create_task(reconcile_periodically(
+            "Portfolio", reconcile_portfolios,
+            PORTFOLIO_RECONCILE_INTERVAL_SECONDS, PORTFOLIO_RECONCILE_BATCH_SIZE
+        )))
+    if cache_bus.redis is not None:
+        background_tasks.append(asyncio.create_task(cache_bus.listen()))
+    if DEAL_EXPIRY_ENABLED:
+        background_tasks.append(asyncio.create_task(deal_expiry.run(db)))
+    if SEARCH_INDEX_ENABLED:
+        background_tasks.append(asyncio.create_task(
+            search_index.keep_fresh(read_db, SEARCH_REFRESH_INTERVAL_SECONDS)
+        ))
+    if STREAM_ENABLED:
+        background_tasks.append(asyncio.create_task(change_feed.watch(db)))
+
+
+@app.on_event("startup")
+async def close_streams_on_exit_signal():
+    # uvicorn only runs the shutdown hooks once in-flight responses have drained, and an
+    # event stream never finishes by itself, so end the streams as soon as draining starts
+    if not STREAM_ENABLED:
+        return
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        previous = signal.getsignal(sig)
+        if not callable(previous):
+            # Nothing handles it in Python, so replacing it would stop the signal terminating us
+            continue
+
+        def handle(signum, frame, previous=previous):
+            loop.call_soon_threadsafe(change_feed.close)
+            # uvicorn's own handler is registered on the event loop and still runs after this
+            previous(signum, frame)
+
+        try:
+            signal.signal(sig, handle)
+        except ValueError:
+            # Not the main thread, e.g. under a test client; shutdown still closes the feed
+            return
+
+
+# Registered last so readiness waits for every other startup hook
+@app.on_event("startup")
+async def mark_ready():
+    global is_ready
+    is_ready = True
+
+
 # Add your routes to the router instead of directly to app
 @api_router.get("/")
 async def root():
     return {"message": "Welcome to the Limited API"}
 
 
+# Health Routes
+@api_router.get("/health/live")
+async def liveness():
+    return {"status": "ok"}
+
+
+@api_router.get("/health/ready")
+async def readiness():
+    """Ready once startup has finished and MongoDB answers a ping"""
+    if not is_ready:
+        return JSONResponse(status_code=503, content={"status": "starting"})
+    try:
+        await asyncio.wait_for(db.command("ping"), timeout=2)
+    except Exception as e:
+        logger.warning(f"Readiness check failed: {e}")
+        return JSONResponse(status_code=503, content={"status": "database unavailable"})
+    return {"status": "ready"}
+
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    content, content_type = render_metrics()
+    return Response(content=content, media_type=content_type)
+
+
 # Include the router in the main app
 app.include_router(api_router)
 
+app.add_middleware(PrometheusMiddleware)
+
 app.add_middleware(
     CORSMiddleware,
     allow_credentials=True,
     allow_origins=["*"],
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "ETag", "Retry-After"],
 )
 
 # Configure logging
@@ -950,4 +1989,13 @@ logger = logging.getLogger(__name__)
 
 @app.on_event("shutdown")
 async def shutdown_db_client():
-    client.close()
\ No newline at end of file
+    global is_ready
+    is_ready = False
+    change_feed.close()
+    for task in background_tasks:
+        task.cancel()
+    if client is not None:
+        client.close()
+    password_hasher.shutdown()
+    await rate_limiter.close()
+    await cache_bus.close()
@@ -0,0 +1,296 @@
+"""Load-test and micro-benchmark the API hot paths.
+
+Runs the app in-process against a local MongoDB (or mongomock with --mongomock),
+seeds synthetic data and reports throughput and p50/p95/p99 per scenario:
+
+    python -m benchmarks.run --output baseline.json
+    python -m benchmarks.run --baseline baseline.json --threshold 0.1
+
+--base-url benchmarks an already running server instead; it must be pointed at the
+same database as --mongo-url so the seeded data is visible to it, and started with
+RATE_LIMIT_ENABLED=false so the login scenario isn't throttled.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+
+import httpx
+
+from benchmarks.stats import compare, summarize
+
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent / "backend"
+sys.path.insert(0, str(BACKEND_DIR))
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--mongo-url", default=os.environ.get("MONGO_URL", "mongodb://localhost:27017"))
+    parser.add_argument("--db-name", default="limited_benchmark")
+    parser.add_argument("--mongomock", action="store_true", help="Use mongomock instead of MongoDB")
+    parser.add_argument("--base-url", help="Benchmark a running server instead of an in-process app")
+    parser.add_argument("--funds", type=int, default=200)
+    parser.add_argument("--companies", type=int, default=200)
+    parser.add_argument("--deals", type=int, default=500)
+    parser.add_argument("--investments", type=int, default=5000)
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--requests", type=int, default=500, help="Requests per scenario")
+    parser.add_argument("--login-requests", type=int, default=50, help="Requests for the bcrypt-bound login")
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--warmup", type=int, default=10)
+    parser.add_argument("--scenarios", help="Comma separated subset of scenarios to run")
+    parser.add_argument("--skip-micro", action="store_true")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="Write JSON results to this file")
+    parser.add_argument("--baseline", help="Compare against a previously saved JSON result")
+    parser.add_argument("--threshold", type=float, default=0.10,
+                        help="Allowed relative regression before failing, e.g. 0.1 for 10%%")
+    parser.add_argument("--max-error-rate", type=float, default=0.01,
+                        help="Fail when more than this fraction of a scenario's requests error")
+    return parser.parse_args(argv)
+
+
+def _git_revision():
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR, stderr=subprocess.DEVNULL
+        ).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def run_scenario(request, requests: int, concurrency: int, warmup: int) -> dict:
+    for _ in range(warmup):
+        await request()
+    latencies = []
+    errors = 0
+    remaining = iter(range(requests))
+
+    async def worker():
+        nonlocal errors
+        for _ in remaining:
+            start = time.perf_counter()
+            try:
+                response = await request()
+                ok = response.status_code < 400
+            except httpx.HTTPError:
+                ok = False
+            latencies.append(time.perf_counter() - start)
+            if not ok:
+                errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return summarize(latencies, errors, time.perf_counter() - start)
+
+
+def build_scenarios(client: httpx.AsyncClient, seeded: dict, tokens: dict, rng: random.Random):
+    lp_headers = {"Authorization": f"Bearer {tokens['lp']}"}
+    emails = seeded["user_emails"]
+    password = seeded["password"]
+    fund_ids = seeded["fund_ids"]
+
+    async def login():
+        return await client.post(
+            "/api/auth/token", data={"username": rng.choice(emails), "password": password}
+        )
+
+    async def featured():
+        return await client.get("/api/featured")
+
+    async def featured_protected():
+        return await client.get("/api/featured/protected", headers=lp_headers)
+
+    async def list_funds():
+        return await client.get("/api/funds", params={"limit": 100}, headers=lp_headers)
+
+    async def list_companies():
+        return await client.get("/api/companies", params={"limit": 100}, headers=lp_headers)
+
+    async def list_deals():
+        return await client.get("/api/deals", params={"limit": 100}, headers=lp_headers)
+
+    async def create_investment():
+        fund_id = rng.choice(fund_ids)
+        return await client.post(
+            "/api/investments",
+            json={"fund_id": fund_id, "amount": seeded["fund_min_investment"][fund_id]},
+            headers=lp_headers,
+        )
+
+    return {
+        "login": login,
+        "featured": featured,
+        "featured_protected": featured_protected,
+        "list_funds": list_funds,
+        "list_companies": list_companies,
+        "list_deals": list_deals,
+        "create_investment": create_investment,
+    }
+
+
+def _time_call(func, iterations: int) -> dict:
+    timings = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return {
+        "iterations": iterations,
+        "mean_ms": round(sum(timings) / iterations * 1000, 4),
+        "min_ms": round(min(timings) * 1000, 4),
+    }
+
+
+async def run_micro(server, password: str) -> dict:
+    results = {}
+
+    start = time.perf_counter()
+    for _ in range(3):
+        await server.password_hasher.hash(password)
+    results["password_hash"] = {
+        "iterations": 3,
+        "mean_ms": round((time.perf_counter() - start) / 3 * 1000, 4),
+    }
+
+    payload = await server.build_featured_payload()
+    results["featured_serialize"] = _time_call(lambda: server.featured_cache.serializer(payload), 200)
+
+    funds = await server.db.funds.find({}, {"_id": 0}).to_list(1000)
+    results[f"fund_models_{len(funds)}"] = _time_call(
+        lambda: [server.Fund(**fund) for fund in funds], 20
+    )
+
+    # A full 1000-document list response: validating models and jsonable_encoder
+    # versus the trusted-document path the list endpoints now take
+    from fastapi.encoders import jsonable_encoder
+    from serialization import dumps, model_projection, trusted_documents
+
+    docs = await server.db.funds.find({}, model_projection(server.Fund)).to_list(1000)
+    docs = (docs * (1000 // max(len(docs), 1) + 1))[:1000]
+    results["list_response_1000_validated"] = _time_call(
+        lambda: json.dumps(jsonable_encoder([server.Fund(**doc) for doc in docs])).encode(), 20
+    )
+    results["list_response_1000_trusted"] = _time_call(
+        lambda: dumps(trusted_documents(server.Fund, docs)), 20
+    )
+    return results
+
+
+async def main(args) -> int:
+    os.environ["MONGO_URL"] = args.mongo_url
+    os.environ["DB_NAME"] = args.db_name
+    # Seed the demo data before timing anything rather than racing the benchmark seed
+    os.environ.setdefault("MIGRATIONS_MODE", "blocking")
+    # Otherwise the login scenario mostly times 429s from the login limits
+    os.environ.setdefault("RATE_LIMIT_ENABLED", "false")
+    # Imported late so the server module picks up the benchmark database settings
+    import server
+    from benchmarks.seed import seed
+
+    if args.mongomock:
+        import database
+        try:
+            from mongomock_motor import AsyncMongoMockClient
+        except ImportError:
+            print("--mongomock needs mongomock-motor: pip install -r backend/requirements.txt",
+                  file=sys.stderr)
+            return 2
+        database.AsyncIOMotorClient = lambda url, **kwargs: AsyncMongoMockClient()
+
+    if args.base_url:
+        await server.connect_to_mongo()
+        transport = None
+        base_url = args.base_url
+    else:
+        await server.app.router.startup()
+        transport = httpx.ASGITransport(app=server.app)
+        base_url = "http://benchmark"
+
+    print(f"Seeding {args.db_name}...", file=sys.stderr)
+    seeded = await seed(
+        server.db, server.password_hasher, funds=args.funds, companies=args.companies,
+        deals=args.deals, investments=args.investments, users=args.users, seed=args.seed,
+    )
+    server.featured_cache.invalidate()
+
+    rng = random.Random(args.seed)
+    scenario_results = {}
+    async with httpx.AsyncClient(transport=transport, base_url=base_url, timeout=60) as client:
+        response = await client.post(
+            "/api/auth/token",
+            data={"username": seeded["user_emails"][-1], "password": seeded["password"]},
+        )
+        response.raise_for_status()
+        tokens = {"lp": response.json()["access_token"]}
+
+        scenarios = build_scenarios(client, seeded, tokens, rng)
+        selected = args.scenarios.split(",") if args.scenarios else list(scenarios)
+        for name in selected:
+            requests = args.login_requests if name == "login" else args.requests
+            print(f"Running {name} ({requests} requests)...", file=sys.stderr)
+            scenario_results[name] = await run_scenario(
+                scenarios[name], requests, args.concurrency, args.warmup
+            )
+
+    micro_results = {} if args.skip_micro else await run_micro(server, seeded["password"])
+
+    if not args.base_url:
+        await server.app.router.shutdown()
+
+    result = {
+        "meta": {
+            "timestamp": datetime.utcnow().isoformat(),
+            "git_revision": _git_revision(),
+            "python": platform.python_version(),
+            "backend": "mongomock" if args.mongomock else ("remote" if args.base_url else "mongodb"),
+            "volumes": {
+                "funds": args.funds,
+                "companies": args.companies,
+                "deals": args.deals,
+                "investments": args.investments,
+                "users": args.users,
+            },
+            "concurrency": args.concurrency,
+        },
+        "scenarios": scenario_results,
+        "micro": micro_results,
+    }
+    print(json.dumps(result, indent=2))
+    if args.output:
+        Path(args.output).write_text(json.dumps(result, indent=2))
+
+    # Error responses are fast, so a failing scenario would otherwise look like a speedup
+    failed = [
+        name for name, scenario in scenario_results.items()
+        if scenario["requests"] and scenario["errors"] / scenario["requests"] > args.max_error_rate
+    ]
+    for name in failed:
+        scenario = scenario_results[name]
+        print(f"{'FAILED':>9}  {name}: {scenario['errors']}/{scenario['requests']} requests errored",
+              file=sys.stderr)
+
+    if args.baseline:
+        baseline = json.loads(Path(args.baseline).read_text())
+        rows = compare(scenario_results, baseline.get("scenarios", {}), args.threshold)
+        rows += compare(micro_results, baseline.get("micro", {}), args.threshold)
+        regressed = [row for row in rows if row["regressed"]]
+        for row in rows:
+            flag = "REGRESSED" if row["regressed"] else "ok"
+            changes = ", ".join(f"{key}={value:+.1%}" for key, value in row.items() if key.endswith("_change"))
+            print(f"{flag:>9}  {row['scenario']}: {changes}", file=sys.stderr)
+        if regressed:
+            return 1
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main(parse_args())))
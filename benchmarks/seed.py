@@ -0,0 +1,142 @@
+import random
+import uuid
+from datetime import datetime, timedelta
+
+from numeric_fields import numeric_fields_for
+from server import FundType, Round, Sector, UserStatus, UserType
+
+
+BENCH_PASSWORD = "benchmark-password"
+
+
+def _batches(docs, size=1000):
+    for start in range(0, len(docs), size):
+        yield docs[start:start + size]
+
+
+async def _insert(collection, docs):
+    for batch in _batches(docs):
+        await collection.insert_many(batch, ordered=False)
+
+
+def _uuid(rng: random.Random) -> str:
+    return str(uuid.UUID(int=rng.getrandbits(128), version=4))
+
+
+def _timestamp(rng: random.Random) -> datetime:
+    return datetime.utcnow() - timedelta(seconds=rng.randint(0, 365 * 24 * 3600))
+
+
+async def seed(db, password_hasher, *, funds: int, companies: int, deals: int,
+               investments: int, users: int, seed: int = 42) -> dict:
+    """Drop and refill the benchmark database with reproducible synthetic data."""
+    rng = random.Random(seed)
+    # Derived collections too, or a rerun serves the previous run's portfolios and stats
+    for name in ("funds", "companies", "deals", "investments", "users",
+                 "portfolios", "fund_stats", "fund_investors"):
+        await db[name].delete_many({})
+
+    fund_docs = []
+    for i in range(funds):
+        fund = {
+            "id": _uuid(rng),
+            "name": f"Bench Fund {i}",
+            "symbol": f"BF{i}",
+            "description": "Synthetic benchmark fund",
+            "min_investment": rng.choice([1000, 10000, 50000]),
+            "carry": rng.choice(["20%", "20-30%", "25%"]),
+            "management_fee": rng.choice(["2% for 10 years", "1.5% for 7 years"]),
+            "status": "Active",
+            "fund_type": rng.choice(list(FundType)),
+            "gp_name": f"GP {i % 50}",
+            "created_at": _timestamp(rng),
+            "updated_at": datetime.utcnow(),
+        }
+        fund.update(numeric_fields_for("funds", fund))
+        fund_docs.append(fund)
+
+    company_docs = []
+    for i in range(companies):
+        company = {
+            "id": _uuid(rng),
+            "name": f"Bench Company {i}",
+            "symbol": f"BC{i}",
+            "lead_investor": f"Investor {i % 30}",
+            "co_investors": [f"Investor {(i + 1) % 30}"],
+            "sector": rng.choice(list(Sector)),
+            "valuation": f"${rng.randint(1, 900)}M",
+            "round": rng.choice(list(Round)),
+            "traction": "Synthetic traction",
+            "created_at": _timestamp(rng),
+            "updated_at": datetime.utcnow(),
+        }
+        company.update(numeric_fields_for("companies", company))
+        company_docs.append(company)
+
+    deal_docs = []
+    for i in range(deals):
+        company = rng.choice(company_docs) if company_docs else None
+        invited = _timestamp(rng)
+        deal = {
+            "id": _uuid(rng),
+            "company_id": company["id"] if company else _uuid(rng),
+            "company_name": company["name"] if company else f"Bench Deal {i}",
+            "symbol": f"BD{i}",
+            "sector": rng.choice(list(Sector)),
+            "round": rng.choice(list(Round)),
+            "valuation": f"${rng.randint(1, 900)}M",
+            "syndicate": f"Syndicate {i % 20}",
+            "co_investors": [],
+            "invited_date": invited,
+            "deadline": invited + timedelta(days=rng.randint(7, 60)),
+            "created_at": invited,
+            "updated_at": datetime.utcnow(),
+        }
+        deal.update(numeric_fields_for("deals", deal))
+        deal_docs.append(deal)
+
+    # bcrypt is deliberately slow, so every benchmark user shares one hash
+    hashed_password = await password_hasher.hash(BENCH_PASSWORD)
+    user_docs = [
+        {
+            "id": _uuid(rng),
+            "email": f"bench{i}@limited.com",
+            "first_name": "Bench",
+            "last_name": f"User {i}",
+            "company_name": None,
+            "user_type": UserType.FUND_MANAGER if i == 0 else UserType.LP,
+            "is_accredited": True,
+            "status": UserStatus.VERIFIED,
+            "hashed_password": hashed_password,
+            "created_at": datetime.utcnow(),
+            "updated_at": datetime.utcnow(),
+        }
+        for i in range(users)
+    ]
+
+    investment_docs = []
+    for _ in range(investments if fund_docs and user_docs else 0):
+        fund = rng.choice(fund_docs)
+        created_at = _timestamp(rng)
+        investment_docs.append({
+            "id": _uuid(rng),
+            "user_id": rng.choice(user_docs)["id"],
+            "fund_id": fund["id"],
+            "amount": fund["min_investment"] * rng.randint(1, 10),
+            "created_at": created_at,
+            "updated_at": created_at,
+            "status": rng.choice(["Pending", "Completed", "Cancelled"]),
+        })
+
+    await _insert(db.funds, fund_docs)
+    await _insert(db.companies, company_docs)
+    await _insert(db.deals, deal_docs)
+    await _insert(db.users, user_docs)
+    await _insert(db.investments, investment_docs)
+
+    return {
+        "password": BENCH_PASSWORD,
+        "fund_ids": [fund["id"] for fund in fund_docs],
+        "fund_min_investment": {fund["id"]: fund["min_investment"] for fund in fund_docs},
+        "user_emails": [user["email"] for user in user_docs],
+    }
@@ -0,0 +1,49 @@
+import math
+from typing import Dict, List
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(pct / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+def summarize(latencies: List[float], errors: int, wall_seconds: float) -> Dict[str, float]:
+    """Latencies in seconds in, milliseconds and requests/second out."""
+    values = sorted(latencies)
+    count = len(values)
+    return {
+        "requests": count,
+        "errors": errors,
+        "throughput_rps": round(count / wall_seconds, 2) if wall_seconds else 0.0,
+        "mean_ms": round(sum(values) / count * 1000, 3) if count else 0.0,
+        "p50_ms": round(percentile(values, 50) * 1000, 3),
+        "p95_ms": round(percentile(values, 95) * 1000, 3),
+        "p99_ms": round(percentile(values, 99) * 1000, 3),
+    }
+
+
+def compare(results: Dict[str, dict], baseline: Dict[str, dict], threshold: float) -> List[dict]:
+    """Flag scenarios whose p95 grew or throughput shrank by more than threshold."""
+    rows = []
+    for name, current in results.items():
+        base = baseline.get(name)
+        if not base:
+            continue
+        row = {"scenario": name, "regressed": False}
+        if "p95_ms" in current and base.get("p95_ms"):
+            change = current["p95_ms"] / base["p95_ms"] - 1
+            row["p95_change"] = round(change, 4)
+            row["regressed"] |= change > threshold
+        if "throughput_rps" in current and base.get("throughput_rps"):
+            change = current["throughput_rps"] / base["throughput_rps"] - 1
+            row["throughput_change"] = round(change, 4)
+            row["regressed"] |= change < -threshold
+        if "mean_ms" in current and base.get("mean_ms") and "p95_ms" not in current:
+            change = current["mean_ms"] / base["mean_ms"] - 1
+            row["mean_change"] = round(change, 4)
+            row["regressed"] |= change > threshold
+        rows.append(row)
+    return rows
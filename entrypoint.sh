@@ -4,25 +4,74 @@ set -e
 # Start the FastAPI backend
 cd /backend || { echo "Backend directory not found"; exit 1; }
 
-echo "Starting FastAPI backend"
+# One worker per core unless told otherwise
+WEB_CONCURRENCY=${WEB_CONCURRENCY:-$(nproc 2>/dev/null || echo 1)}
+# Seconds a worker may spend finishing in-flight requests after SIGTERM
+GRACEFUL_TIMEOUT=${GRACEFUL_TIMEOUT:-30}
+# Seconds to wait for the readiness probe before giving up
+READY_TIMEOUT=${READY_TIMEOUT:-60}
+
+# Workers write metrics to a shared directory so /metrics covers the whole server
+if [ "$WEB_CONCURRENCY" -gt 1 ]; then
+    export PROMETHEUS_MULTIPROC_DIR=${PROMETHEUS_MULTIPROC_DIR:-/tmp/prometheus}
+    rm -rf "$PROMETHEUS_MULTIPROC_DIR"
+    mkdir -p "$PROMETHEUS_MULTIPROC_DIR"
+fi
+
+echo "Starting FastAPI backend with $WEB_CONCURRENCY workers"
 # Start Uvicorn with proper host binding
-uvicorn server:app --host 0.0.0.0 --port 8001 &
+uvicorn server:app --host 0.0.0.0 --port 8001 \
+    --workers "$WEB_CONCURRENCY" \
+    --timeout-graceful-shutdown "$GRACEFUL_TIMEOUT" \
+    --proxy-headers --forwarded-allow-ips "${FORWARDED_ALLOW_IPS:-127.0.0.1}" &
 BACKEND_PID=$!
 
-echo "Waiting for backend to start..."
-sleep 30
+echo "Waiting for backend to become ready..."
+elapsed=0
+until wget -q -O /dev/null http://127.0.0.1:8001/api/health/ready 2>/dev/null; do
+    if ! kill -0 $BACKEND_PID 2>/dev/null; then
+        echo "Backend failed to start at initialization, exiting"
+        exit 1
+    fi
+    if [ "$elapsed" -ge "$READY_TIMEOUT" ]; then
+        echo "Backend not ready after ${READY_TIMEOUT}s, exiting"
+        kill $BACKEND_PID
+        exit 1
+    fi
+    sleep 1
+    elapsed=$((elapsed + 1))
+done
+echo "Backend ready after ${elapsed}s"
 
-if ! kill -0 $BACKEND_PID 2>/dev/null; then
-    echo "Backend failed to start at initialization, exiting"
-    exit 1
-fi
+# Proxies in front of nginx whose X-Forwarded-For is trusted, e.g. the TLS ingress
+TRUSTED_PROXY_CIDRS=${TRUSTED_PROXY_CIDRS:-"10.0.0.0/8 172.16.0.0/12 192.168.0.0/16"}
+: > /etc/nginx/real_ip.conf
+for cidr in $TRUSTED_PROXY_CIDRS; do
+    echo "set_real_ip_from $cidr;" >> /etc/nginx/real_ip.conf
+done
 
 # Start Nginx
 nginx -g 'daemon off;' &
 NGINX_PID=$!
 
-# Handle termination signals
-trap 'kill $BACKEND_PID $NGINX_PID; exit 0' SIGTERM SIGINT
+# Drain on termination: stop nginx taking new connections and let it finish the
+# requests it has proxied, then let uvicorn finish its in-flight work
+shutdown() {
+    echo "Draining connections..."
+    kill -QUIT $NGINX_PID 2>/dev/null || true
+    # Open event streams never finish on their own, so don't wait past the grace period
+    waited=0
+    while kill -0 $NGINX_PID 2>/dev/null && [ "$waited" -lt "$GRACEFUL_TIMEOUT" ]; do
+        sleep 1
+        waited=$((waited + 1))
+    done
+    kill -TERM $NGINX_PID 2>/dev/null || true
+    wait $NGINX_PID 2>/dev/null || true
+    kill -TERM $BACKEND_PID 2>/dev/null || true
+    wait $BACKEND_PID 2>/dev/null || true
+    exit 0
+}
+trap shutdown TERM INT
 
 # Check if processes are still running
 while kill -0 $BACKEND_PID 2>/dev/null && kill -0 $NGINX_PID 2>/dev/null; do
@@ -0,0 +1,113 @@
+import asyncio
+
+import pytest
+from pydantic import BaseModel
+
+from loaders import Loader, Loaders, embed_related, parse_includes
+
+
+class FakeCursor:
+    def __init__(self, docs):
+        self.docs = docs
+
+    async def to_list(self, length):
+        return self.docs[:length]
+
+
+class FakeCollection:
+    """Records every find() so tests can count the queries a loader makes."""
+
+    def __init__(self, docs, error=None):
+        self.docs = docs
+        self.error = error
+        self.queries = []
+
+    def find(self, query, projection=None):
+        self.queries.append(query)
+        if self.error is not None:
+            raise self.error
+        wanted = query["id"]["$in"]
+        return FakeCursor([doc for doc in self.docs if doc["id"] in wanted])
+
+
+PROJECTION = {"_id": 0, "id": 1, "name": 1}
+
+
+class Fund(BaseModel):
+    id: str
+    name: str
+    status: str = "open"
+
+
+def test_loads_in_one_tick_share_a_single_in_query():
+    collection = FakeCollection([{"id": f"f{i}", "name": f"Fund {i}"} for i in range(5)])
+
+    async def scenario():
+        loader = Loader(collection, projection=PROJECTION)
+        return await asyncio.gather(*(loader.load(f"f{i}") for i in range(5)))
+
+    docs = asyncio.run(scenario())
+    assert [doc["id"] for doc in docs] == [f"f{i}" for i in range(5)]
+    assert collection.queries == [{"id": {"$in": [f"f{i}" for i in range(5)]}}]
+
+
+def test_missing_and_empty_ids_resolve_to_none():
+    collection = FakeCollection([{"id": "f1", "name": "Fund 1"}])
+
+    async def scenario():
+        loader = Loader(collection, projection=PROJECTION)
+        return await loader.load_many(["f1", "missing", None, "", "f1"])
+
+    docs = asyncio.run(scenario())
+    assert docs == [{"id": "f1", "name": "Fund 1"}, None, None, None, {"id": "f1", "name": "Fund 1"}]
+    # Empty ids never reach the query and repeated ids are only asked for once
+    assert collection.queries == [{"id": {"$in": ["f1", "missing"]}}]
+
+
+def test_results_are_memoized_across_batches():
+    collection = FakeCollection([{"id": "f1", "name": "Fund 1"}, {"id": "f2", "name": "Fund 2"}])
+
+    async def scenario():
+        loader = Loader(collection, projection=PROJECTION)
+        await loader.load("f1")
+        return await loader.load_many(["f1", "f2"])
+
+    docs = asyncio.run(scenario())
+    assert [doc["id"] for doc in docs] == ["f1", "f2"]
+    assert collection.queries == [{"id": {"$in": ["f1"]}}, {"id": {"$in": ["f2"]}}]
+
+
+def test_a_failed_batch_is_retried_by_the_next_load():
+    collection = FakeCollection([{"id": "f1", "name": "Fund 1"}], error=RuntimeError("down"))
+
+    async def scenario():
+        loader = Loader(collection, projection=PROJECTION)
+        with pytest.raises(RuntimeError):
+            await loader.load("f1")
+        collection.error = None
+        return await loader.load("f1")
+
+    assert asyncio.run(scenario()) == {"id": "f1", "name": "Fund 1"}
+    assert len(collection.queries) == 2
+
+
+def test_embed_related_makes_one_query_per_collection():
+    funds = FakeCollection([{"id": "f1", "name": "Fund 1"}, {"id": "f2", "name": "Fund 2"}])
+    deals = [{"id": f"d{i}", "fund_id": f"f{i % 2 + 1}"} for i in range(4)] + [{"id": "d4"}]
+
+    loaders = Loaders({"funds": funds}, {"funds": Fund})
+    includes = parse_includes("fund", {"fund": ("funds", "fund_id")})
+
+    asyncio.run(embed_related(loaders, deals, includes))
+    assert [deal["fund"] and deal["fund"]["id"] for deal in deals] == ["f1", "f2", "f1", "f2", None]
+    assert len(funds.queries) == 1
+    # Read with the model's projection, so defaults are filled in without validation
+    assert deals[0]["fund"] == {"id": "f1", "name": "Fund 1", "status": "open"}
+
+
+def test_parse_includes_rejects_unknown_names():
+    allowed = {"fund": ("funds", "fund_id")}
+    assert parse_includes(None, allowed) == {}
+    assert parse_includes(" fund ,", allowed) == allowed
+    with pytest.raises(ValueError):
+        parse_includes("fund,company", allowed)
@@ -0,0 +1,122 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+
+from migrations import LOCK_ID, Migration, MigrationLock, pending_migrations, run_migrations
+
+
+mongomock_motor = pytest.importorskip("mongomock_motor")
+
+
+@pytest.fixture
+def db():
+    return mongomock_motor.AsyncMongoMockClient()["migrations"]
+
+
+def counting_migrations(calls):
+    def migration(migration_id):
+        async def run(db):
+            calls.append(migration_id)
+        return Migration(migration_id, f"migration {migration_id}", run)
+    return [migration("0001"), migration("0002")]
+
+
+async def hold_lease(db, owner="other-host:1", expires_in=60):
+    await db.migration_locks.insert_one({
+        "_id": LOCK_ID,
+        "owner": owner,
+        "expires_at": datetime.utcnow() + timedelta(seconds=expires_in),
+    })
+
+
+def test_a_second_run_skips_applied_migrations(db):
+    calls = []
+    migrations = counting_migrations(calls)
+
+    async def scenario():
+        first = await run_migrations(db, migrations)
+        second = await run_migrations(db, migrations)
+        return first, second, await db.migration_locks.count_documents({})
+
+    first, second, locks = asyncio.run(scenario())
+    assert first == ["0001", "0002"]
+    assert second == []
+    assert calls == ["0001", "0002"]
+    # The lease is released once migrating is done
+    assert locks == 0
+
+
+def test_only_new_migrations_are_applied(db):
+    calls = []
+    migrations = counting_migrations(calls)
+
+    async def scenario():
+        await run_migrations(db, migrations[:1])
+        return await run_migrations(db, migrations)
+
+    assert asyncio.run(scenario()) == ["0002"]
+    assert calls == ["0001", "0002"]
+
+
+def test_a_held_lease_cannot_be_acquired_until_it_lapses(db):
+    async def scenario():
+        await hold_lease(db)
+        lock = MigrationLock(db)
+        held = await lock.acquire()
+        await db.migration_locks.update_one(
+            {"_id": LOCK_ID}, {"$set": {"expires_at": datetime.utcnow() - timedelta(seconds=1)}}
+        )
+        lapsed = await lock.acquire()
+        # Renewing a lease we hold succeeds
+        renewed = await lock.acquire()
+        return held, lapsed, renewed, await db.migration_locks.find_one({"_id": LOCK_ID})
+
+    held, lapsed, renewed, lease = asyncio.run(scenario())
+    assert (held, lapsed, renewed) == (False, True, True)
+    assert lease["expires_at"] > datetime.utcnow()
+
+
+def test_release_leaves_another_owners_lease(db):
+    async def scenario():
+        await hold_lease(db)
+        await MigrationLock(db).release()
+        return await db.migration_locks.count_documents({})
+
+    assert asyncio.run(scenario()) == 1
+
+
+def test_waits_while_another_process_holds_the_lease(db):
+    calls = []
+    migrations = counting_migrations(calls)
+
+    async def other_process():
+        # Finishes the migrations while run_migrations is polling
+        await asyncio.sleep(0.05)
+        for migration in migrations:
+            await db.schema_migrations.insert_one({"_id": migration.id})
+        await db.migration_locks.delete_one({"_id": LOCK_ID})
+
+    async def scenario():
+        await hold_lease(db)
+        applied, _ = await asyncio.gather(
+            run_migrations(db, migrations, poll_interval=0.01), other_process()
+        )
+        return applied, await pending_migrations(db, migrations)
+
+    applied, pending = asyncio.run(scenario())
+    assert applied == []
+    assert pending == []
+    assert calls == []
+
+
+def test_takes_over_a_lapsed_lease(db):
+    calls = []
+    migrations = counting_migrations(calls)
+
+    async def scenario():
+        await hold_lease(db, expires_in=0.05)
+        return await run_migrations(db, migrations, poll_interval=0.01)
+
+    assert asyncio.run(scenario()) == ["0001", "0002"]
+    assert calls == ["0001", "0002"]
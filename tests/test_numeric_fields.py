@@ -0,0 +1,82 @@
+import pytest
+
+from numeric_fields import (
+    add_range_filter,
+    numeric_fields_for,
+    parse_management_fee,
+    parse_money_cents,
+    parse_percent_range_bps,
+)
+
+
+@pytest.mark.parametrize("value, cents", [
+    ("$1.2M", 120_000_000),
+    ("$6.08B", 608_000_000_000),
+    ("$500K", 50_000_000),
+    ("$1,250,000", 125_000_000),
+    ("2.5m", 250_000_000),
+    (" $ 40 ", 4_000),
+])
+def test_parse_money_cents(value, cents):
+    assert parse_money_cents(value) == cents
+
+
+@pytest.mark.parametrize("value", [None, "", "   ", "N/A", "$", "1.2X", "about $5M", "$1.2.3M"])
+def test_parse_money_cents_rejects_blank_and_bad_input(value):
+    assert parse_money_cents(value) is None
+
+
+@pytest.mark.parametrize("value, bps", [
+    ("15%", (1500, 1500)),
+    ("20-30%", (2000, 3000)),
+    ("20 to 30%", (2000, 3000)),
+    ("12.5%", (1250, 1250)),
+    ("20% with hurdle", (2000, 2000)),
+])
+def test_parse_percent_range_bps(value, bps):
+    assert parse_percent_range_bps(value) == bps
+
+
+@pytest.mark.parametrize("value", [None, "", "twenty percent", "%"])
+def test_parse_percent_range_bps_rejects_blank_and_bad_input(value):
+    assert parse_percent_range_bps(value) == (None, None)
+
+
+def test_parse_management_fee():
+    assert parse_management_fee("2% for 10 years") == (200, 10)
+    assert parse_management_fee("2.5%") == (250, None)
+    assert parse_management_fee("") == (None, None)
+    assert parse_management_fee("negotiable") == (None, None)
+
+
+def test_numeric_fields_for_each_collection():
+    assert numeric_fields_for("funds", {"carry": "20-30%", "management_fee": "2% for 10 years"}) == {
+        "carry_low_bps": 2000,
+        "carry_high_bps": 3000,
+        "management_fee_bps": 200,
+        "management_fee_years": 10,
+    }
+    assert numeric_fields_for("deals", {"valuation": "$1.2M"}) == {"valuation_cents": 120_000_000}
+    assert numeric_fields_for("companies", {}) == {"valuation_cents": None}
+    assert numeric_fields_for("users", {"valuation": "$1M"}) == {}
+
+
+def test_add_range_filter_bounds():
+    query = {}
+    add_range_filter(query, "valuation_cents", minimum=100, maximum=500)
+    assert query == {"valuation_cents": {"$gte": 100, "$lte": 500}}
+
+
+def test_add_range_filter_keeps_zero_bounds():
+    query = {}
+    add_range_filter(query, "carry_low_bps", minimum=0, maximum=0)
+    assert query == {"carry_low_bps": {"$gte": 0, "$lte": 0}}
+
+
+def test_add_range_filter_open_sides_and_existing_conditions():
+    query = {"valuation_cents": {"$type": "number"}}
+    add_range_filter(query, "valuation_cents", maximum=0)
+    assert query == {"valuation_cents": {"$type": "number", "$lte": 0}}
+    empty = {}
+    add_range_filter(empty, "valuation_cents")
+    assert empty == {}
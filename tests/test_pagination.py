@@ -0,0 +1,81 @@
+import base64
+import json
+from datetime import datetime
+
+import pytest
+
+from pagination import build_projection, decode_cursor, encode_cursor, keyset_filter
+
+
+def _raw_cursor(payload) -> str:
+    return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode().rstrip("=")
+
+
+def test_cursor_round_trips_datetimes():
+    created_at = datetime(2024, 5, 1, 12, 30, 15, 123000)
+    cursor = encode_cursor({"id": "fund-1", "created_at": created_at}, "created_at")
+    assert "=" not in cursor
+    assert decode_cursor(cursor) == (created_at, "fund-1")
+
+
+def test_cursor_round_trips_numbers_and_missing_values():
+    assert decode_cursor(encode_cursor({"id": "a", "valuation_cents": 125}, "valuation_cents")) == (125, "a")
+    assert decode_cursor(encode_cursor({"id": "b"}, "valuation_cents")) == (None, "b")
+
+
+@pytest.mark.parametrize("cursor", [
+    "not base64!",
+    base64.urlsafe_b64encode(b"not json").decode(),
+    _raw_cursor(["only-one-part"]),
+    _raw_cursor({"created_at": 1, "id": 2}),
+    _raw_cursor([{"$ne": None}, "fund-1"]),
+    _raw_cursor([{"$date": "yesterday"}, "fund-1"]),
+    _raw_cursor([1, {"$gt": ""}]),
+])
+def test_tampered_cursors_are_rejected(cursor):
+    with pytest.raises(ValueError, match="Invalid cursor"):
+        decode_cursor(cursor)
+
+
+def test_keyset_filter_breaks_ties_on_id():
+    descending = keyset_filter("created_at", True, 5, "m")
+    assert descending == {"$or": [
+        {"created_at": {"$lt": 5}},
+        {"created_at": 5, "id": {"$lt": "m"}},
+    ]}
+    ascending = keyset_filter("valuation_cents", False, 5, "m")
+    assert ascending["$or"][1] == {"valuation_cents": 5, "id": {"$gt": "m"}}
+
+
+def test_keyset_pages_cover_equal_sort_values_exactly_once():
+    docs = [{"id": doc_id, "created_at": value} for doc_id, value in
+            [("a", 1), ("b", 2), ("c", 2), ("d", 2), ("e", 3)]]
+
+    def after(doc, cursor_doc):
+        # Evaluates the filter the way MongoDB would for these simple documents
+        (strictly_after, tie) = keyset_filter("created_at", True, cursor_doc["created_at"],
+                                              cursor_doc["id"])["$or"]
+        return doc["created_at"] < strictly_after["created_at"]["$lt"] or (
+            doc["created_at"] == tie["created_at"] and doc["id"] < tie["id"]["$lt"]
+        )
+
+    ordered = sorted(docs, key=lambda doc: (doc["created_at"], doc["id"]), reverse=True)
+    seen = []
+    cursor_doc = None
+    while True:
+        remaining = [doc for doc in ordered if cursor_doc is None or after(doc, cursor_doc)]
+        page = remaining[:2]
+        if not page:
+            break
+        seen.extend(doc["id"] for doc in page)
+        cursor_doc = page[-1]
+    assert seen == ["e", "d", "c", "b", "a"]
+
+
+def test_build_projection_adds_required_fields_and_rejects_unknown():
+    assert build_projection(None, ["name"]) is None
+    assert build_projection("name, symbol", ["name", "symbol"]) == {
+        "_id": 0, "id": 1, "created_at": 1, "name": 1, "symbol": 1,
+    }
+    with pytest.raises(ValueError, match="Unknown fields: secret"):
+        build_projection("name,secret", ["name"])
@@ -0,0 +1,158 @@
+import asyncio
+import os
+
+import pytest
+from fastapi import HTTPException
+from starlette.requests import Request
+
+import rate_limit
+from rate_limit import Limit, MemoryBackend, RateLimiter
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(rate_limit.time, "monotonic", clock)
+    return clock
+
+
+def take(backend, key, limit):
+    return asyncio.run(backend.take(key, limit))
+
+
+def test_limit_parse():
+    limit = Limit.parse("20/60")
+    assert limit == Limit(20, 60.0)
+    assert limit.rate == pytest.approx(1 / 3)
+
+
+def test_bucket_allows_a_burst_then_exhausts(clock):
+    backend = MemoryBackend()
+    limit = Limit(3, 30)
+    assert [take(backend, "k", limit)[0] for _ in range(3)] == [True, True, True]
+    allowed, retry_after = take(backend, "k", limit)
+    assert not allowed
+    # One token refills every 10 seconds
+    assert retry_after == pytest.approx(10)
+
+
+def test_bucket_refills_over_time_up_to_capacity(clock):
+    backend = MemoryBackend()
+    limit = Limit(3, 30)
+    for _ in range(3):
+        take(backend, "k", limit)
+    clock.now += 10
+    assert take(backend, "k", limit)[0]
+    assert not take(backend, "k", limit)[0]
+    clock.now += 3600
+    assert [take(backend, "k", limit)[0] for _ in range(4)] == [True, True, True, False]
+
+
+def test_buckets_are_per_key_and_bounded(clock):
+    backend = MemoryBackend(maxsize=2)
+    limit = Limit(1, 60)
+    assert take(backend, "a", limit)[0]
+    assert take(backend, "b", limit)[0]
+    assert not take(backend, "a", limit)[0]
+    take(backend, "c", limit)
+    assert len(backend._buckets) == 2
+
+
+def limiter(**limits):
+    return RateLimiter({
+        ("login", "ip"): Limit.parse(limits.get("ip", "100/60")),
+        ("login", "email"): Limit.parse(limits.get("email", "100/60")),
+    })
+
+
+def test_limiter_keys_by_email_across_ips(clock):
+    rate_limiter = limiter(email="2/60")
+    hits = [
+        asyncio.run(rate_limiter.hit("login", ip=f"10.0.0.{i}", email="lp@example.com"))
+        for i in range(3)
+    ]
+    assert hits[:2] == [None, None]
+    assert hits[2] == 30
+    assert asyncio.run(rate_limiter.hit("login", ip="10.0.0.9", email="other@example.com")) is None
+
+
+def test_limiter_keys_by_ip_across_emails(clock):
+    rate_limiter = limiter(ip="2/60")
+    hits = [
+        asyncio.run(rate_limiter.hit("login", ip="10.0.0.1", email=f"lp{i}@example.com"))
+        for i in range(3)
+    ]
+    assert hits == [None, None, 30]
+
+
+def test_limiter_ignores_unlimited_actions_and_can_be_disabled(clock):
+    rate_limiter = limiter(ip="1/60")
+    assert asyncio.run(rate_limiter.hit("export", ip="10.0.0.1")) is None
+    rate_limiter.enabled = False
+    assert all(asyncio.run(rate_limiter.hit("login", ip="10.0.0.1")) is None for _ in range(3))
+
+
+def test_limiter_falls_back_to_memory_when_the_backend_fails(clock):
+    class BrokenBackend:
+        async def take(self, key, limit):
+            raise ConnectionError("redis is down")
+
+    rate_limiter = RateLimiter({("login", "ip"): Limit(1, 60)}, backend=BrokenBackend())
+    assert asyncio.run(rate_limiter.hit("login", ip="10.0.0.1")) is None
+    assert asyncio.run(rate_limiter.hit("login", ip="10.0.0.1")) == 60
+
+
+@pytest.fixture
+def server(monkeypatch):
+    monkeypatch.setenv("MONGO_URL", os.environ.get("MONGO_URL", "mongodb://localhost:27017"))
+    return pytest.importorskip("server")
+
+
+def test_enforce_rate_limit_raises_429_with_retry_after(server, clock, monkeypatch):
+    monkeypatch.setattr(server, "rate_limiter", limiter(email="1/60"))
+    request = Request({"type": "http", "client": ("10.0.0.1", 5000), "headers": []})
+    asyncio.run(server.enforce_rate_limit("login", request, "LP@example.com"))
+    with pytest.raises(HTTPException) as raised:
+        # Emails are normalised, so case and whitespace don't dodge the limit
+        asyncio.run(server.enforce_rate_limit("login", request, " lp@example.com"))
+    assert raised.value.status_code == 429
+    assert raised.value.headers == {"Retry-After": "60"}
+
+
+def test_forwarded_clients_get_separate_buckets(server, clock, monkeypatch):
+    proxy_headers = pytest.importorskip("uvicorn.middleware.proxy_headers")
+    import httpx
+    from fastapi import FastAPI
+
+    monkeypatch.setattr(server, "rate_limiter", limiter(ip="1/60"))
+    app = FastAPI()
+
+    @app.post("/login/{email}")
+    async def login(email: str, request: Request):
+        await server.enforce_rate_limit("login", request, email)
+
+    # Every request arrives from nginx on 127.0.0.1, as uvicorn is started by entrypoint.sh
+    trusted = proxy_headers.ProxyHeadersMiddleware(app, trusted_hosts="127.0.0.1")
+    transport = httpx.ASGITransport(app=trusted, client=("127.0.0.1", 5000))
+
+    async def login_as(client_ip, email):
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            response = await client.post(f"/login/{email}", headers={"X-Forwarded-For": client_ip})
+            return response.status_code
+
+    async def scenario():
+        return [
+            await login_as("203.0.113.1", "a@example.com"),
+            await login_as("198.51.100.2", "b@example.com"),
+            await login_as("203.0.113.1", "c@example.com"),
+        ]
+
+    assert asyncio.run(scenario()) == [200, 200, 429]
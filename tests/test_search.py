@@ -0,0 +1,99 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+
+from search import REFRESH_OVERLAP, RANKED_POSTING_MIN, SearchIndex, tokenize
+
+
+def fund(doc_id, name, symbol="", **fields):
+    return {"id": doc_id, "name": name, "symbol": symbol, **fields}
+
+
+def ids(results):
+    return [result["id"] for result in results]
+
+
+def test_tokenize_folds_case_and_accents():
+    assert tokenize("Société Générale-Fund 2") == ["societe", "generale", "fund", "2"]
+
+
+def test_prefix_search_matches_every_term():
+    index = SearchIndex()
+    index.add("funds", fund("f1", "Sequoia Growth", "SEQG"))
+    index.add("funds", fund("f2", "Sequoia Seed", "SEQS"))
+    index.add("companies", {"id": "c1", "name": "Growth Labs", "symbol": "GRL"})
+
+    assert set(ids(index.search("seq"))) == {"f1", "f2"}
+    assert ids(index.search("seq gro")) == ["f1"]
+    assert ids(index.search("gro", kinds=["companies"])) == ["c1"]
+    assert index.search("nothing") == []
+    assert index.search("  ") == []
+
+
+def test_whole_words_and_heavier_fields_rank_first():
+    index = SearchIndex()
+    index.add("funds", fund("partial", "Acmeco Partners"))
+    index.add("funds", fund("word", "Acme Partners"))
+    index.add("funds", fund("gp", "Other Fund", gp_name="Acme"))
+    assert ids(index.search("acme")) == ["word", "partial", "gp"]
+
+
+def test_terms_longer_than_the_indexed_prefix_still_filter():
+    index = SearchIndex(max_prefix=4)
+    index.add("funds", fund("f1", "Andreessen"))
+    index.add("funds", fund("f2", "Andromeda"))
+    assert ids(index.search("andreessen")) == ["f1"]
+
+
+def test_remove_and_re_add_replace_an_entry():
+    index = SearchIndex()
+    index.add("funds", fund("f1", "Benchmark Capital"))
+    index.add("funds", fund("f1", "Renamed Fund"))
+    assert index.search("bench") == []
+    assert ids(index.search("renamed")) == ["f1"]
+    assert len(index) == 1
+
+    index.remove("funds", "f1")
+    assert index.search("renamed") == []
+    assert len(index) == 0
+    assert index._postings == {}
+
+
+def test_ranked_postings_stay_sorted_through_writes():
+    index = SearchIndex()
+    for i in range(RANKED_POSTING_MIN):
+        index.add("funds", fund(f"f{i}", f"Alpha {i}"))
+    assert len(index.search("a", limit=3)) == 3
+    assert "a" in index._ranked
+
+    index.add("funds", fund("best", "A", symbol="A"))
+    assert index.search("a", limit=1)[0]["id"] == "best"
+    index.remove("funds", "best")
+    assert "best" not in ids(index.search("a", limit=10))
+    assert index._ranked["a"] == sorted(index._ranked["a"])
+
+
+def test_refresh_reads_from_the_watermark_minus_the_overlap():
+    mongomock_motor = pytest.importorskip("mongomock_motor")
+    db = mongomock_motor.AsyncMongoMockClient()["search"]
+    then = datetime(2024, 1, 1)
+
+    async def scenario():
+        await db.funds.insert_one(fund("old", "Old Fund", updated_at=then))
+        index = SearchIndex()
+        await index.load(db)
+        assert index.loaded
+        assert index._watermarks["funds"] == then
+
+        # Written by another worker: one inside the overlap window, one too old to be re-read
+        await db.funds.insert_one(fund("late", "Late Fund", updated_at=then - REFRESH_OVERLAP / 2))
+        await db.funds.insert_one(fund("stale", "Stale Fund", updated_at=then - 2 * REFRESH_OVERLAP))
+        await db.funds.insert_one(fund("new", "New Fund", updated_at=then + timedelta(seconds=5)))
+        await db.funds.update_one({"id": "old"}, {"$set": {"name": "Renamed Fund"}})
+        await index.refresh(db)
+        return index
+
+    index = asyncio.run(scenario())
+    assert set(ids(index.search("fund"))) == {"old", "late", "new"}
+    assert index._watermarks["funds"] == then + timedelta(seconds=5)